@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from api.instrumentation import install_serializer_timing
+
+        install_serializer_timing()
+        import api.db_connections  # noqa: F401
+        import api.recipe_index  # noqa: F401
@@ -0,0 +1,272 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from django_units.models import Recipe, ShoppingCart, Subscriber, Tag
+
+from api.renderers import FastJSONRenderer
+
+
+# (название, адрес); в адресе подставляются {recipe} и {tags}
+CASES = [
+    ("recipes-list", "/api/recipes/?limit=20"),
+    ("recipes-list-tags", "/api/recipes/?limit=20&{tags}"),
+    ("recipes-list-favorited", "/api/recipes/?limit=20&is_favorited=1"),
+    ("recipes-list-cursor", "/api/recipes/?limit=20&pagination=cursor"),
+    (
+        "recipes-list-sparse",
+        "/api/recipes/?limit=20&fields=id,name,image,cooking_time",
+    ),
+    ("recipes-detail", "/api/recipes/{recipe}/"),
+    ("recipes-feed", "/api/recipes/feed/?limit=20"),
+    ("users-list", "/api/users/?limit=20"),
+    ("users-me", "/api/users/me/"),
+    ("users-subscriptions", "/api/users/subscriptions/?limit=20"),
+    (
+        "users-subscriptions-limited",
+        "/api/users/subscriptions/?limit=20&recipes_limit=3",
+    ),
+    ("tags-list", "/api/tags/"),
+    ("ingredients-list", "/api/ingredients/"),
+    ("ingredients-search", "/api/ingredients/?name=мол"),
+    ("recipes-download", "/api/recipes/download_shopping_cart/"),
+]
+
+# эндпоинты чтения для нагрузочного прогона против запущенного сервера
+# (сравнение режимов SERVER_MODE=sync и SERVER_MODE=async)
+LOAD_CASES = [
+    "recipes-list",
+    "recipes-detail",
+    "users-subscriptions",
+    "tags-list",
+    "ingredients-list",
+    "recipes-download",
+]
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[round(percent / 100 * (len(values) - 1))]
+
+
+def get_benchmark_user():
+    # пользователь с наибольшим числом подписок и рецептов в корзине -
+    # самый тяжелый случай для подписок и списка покупок
+    subscriber = (
+        Subscriber.objects.values("user")
+        .annotate(total=Count("id"))
+        .order_by("-total")
+        .first()
+    )
+    if subscriber is None:
+        cart = ShoppingCart.objects.values("user").first()
+        return cart and cart["user"]
+    return subscriber["user"]
+
+
+def get_context():
+    recipe = Recipe.objects.order_by("id").first()
+    tags = Tag.objects.values_list("slug", flat=True)[:2]
+    return {
+        "recipe": recipe.id if recipe else 0,
+        "tags": "&".join(f"tags={slug}" for slug in tags),
+    }
+
+
+def get_client():
+    from django.contrib.auth import get_user_model
+
+    client = APIClient()
+    user_id = get_benchmark_user()
+    if user_id is not None:
+        client.force_authenticate(get_user_model().objects.get(id=user_id))
+    return client
+
+
+def request(client, url, headers):
+    response = client.get(url, **headers)
+    if response.streaming:
+        content = b"".join(response.streaming_content)
+    else:
+        content = response.content
+    return response, content
+
+
+def measure_encoding(data, iterations):
+    # время кодирования одного ответа stdlib json (JSONRenderer) и
+    # ускоренным рендерером; потоковые ответы не измеряются
+    if data is None:
+        return None, None
+    timings = []
+    for renderer in [JSONRenderer(), FastJSONRenderer()]:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            renderer.render(data)
+        timings.append((time.perf_counter() - started) / iterations * 1000)
+    return timings
+
+
+def run_case(client, url, iterations, warmup, cold, headers=None):
+    headers = headers or {}
+    for _ in range(warmup):
+        request(client, url, headers)
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response, content = request(client, url, headers)
+            timings.append(time.perf_counter() - started)
+        queries.append(len(context.captured_queries))
+    json_ms, fast_json_ms = measure_encoding(
+        getattr(response, "data", None), iterations
+    )
+    return {
+        "status": response.status_code,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "queries": max(queries),
+        "bytes": len(content),
+        "json_ms": json_ms,
+        "fast_json_ms": fast_json_ms,
+    }
+
+
+def run_benchmark(cases=None, iterations=50, warmup=5, cold=False):
+    client = get_client()
+    context = get_context()
+    results = {}
+    for name, url in cases or CASES:
+        results[name] = run_case(
+            client, url.format(**context), iterations, warmup, cold
+        )
+    return results
+
+
+def format_results(results, baseline=None):
+    lines = [
+        f"{'endpoint':32} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'queries':>8} {'bytes':>10} {'json ms':>8} {'fast ms':>8}"
+    ]
+    for name, result in results.items():
+        line = (
+            f"{name:32} {result['status']:>6} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['queries']:>8} "
+            f"{result['bytes']:>10} {format_ms(result.get('json_ms'))} "
+            f"{format_ms(result.get('fast_json_ms'))}"
+        )
+        if baseline and name in baseline:
+            change = get_change(result, baseline[name])
+            line += f" {change:>+8.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def format_ms(value):
+    return f"{'-':>8}" if value is None else f"{value:>8.3f}"
+
+
+def get_change(result, base):
+    if not base["p50_ms"]:
+        return 0.0
+    return (result["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100
+
+
+def get_token():
+    from rest_framework.authtoken.models import Token
+
+    user_id = get_benchmark_user()
+    if user_id is None:
+        return None
+    return Token.objects.get_or_create(user_id=user_id)[0].key
+
+
+def fetch(url, headers):
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=30) as response:
+            response.read()
+            ok = response.status < 400
+    except OSError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_load_case(url, headers, concurrency, duration):
+    # concurrency клиентов без пауз повторяют запрос duration секунд
+    deadline = time.perf_counter() + duration
+
+    def client():
+        results = []
+        while time.perf_counter() < deadline:
+            results.append(fetch(url, headers))
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(client) for _ in range(concurrency)]
+        results = [result for future in futures for result in future.result()]
+    elapsed = time.perf_counter() - started
+    timings = [timing for timing, ok in results]
+    return {
+        "requests": len(results),
+        "errors": sum(not ok for timing, ok in results),
+        "rps": len(results) / elapsed,
+        "p50_ms": percentile(timings, 50) * 1000 if timings else 0.0,
+        "p95_ms": percentile(timings, 95) * 1000 if timings else 0.0,
+    }
+
+
+def run_load(server, cases, concurrency=32, duration=10):
+    context = get_context()
+    token = get_token()
+    headers = {"Authorization": f"Token {token}"} if token else {}
+    return {
+        name: run_load_case(
+            server.rstrip("/") + url.format(**context),
+            headers,
+            concurrency,
+            duration,
+        )
+        for name, url in cases
+    }
+
+
+def format_load_results(results, baseline=None):
+    lines = [
+        f"{'endpoint':32} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'errors':>7}"
+    ]
+    for name, result in results.items():
+        line = (
+            f"{name:32} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['errors']:>7}"
+        )
+        if baseline and name in baseline and baseline[name]["rps"]:
+            change = (result["rps"] - baseline[name]["rps"]) / (
+                baseline[name]["rps"]
+            )
+            line += f" {change * 100:>+8.1f}%"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
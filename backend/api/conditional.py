@@ -0,0 +1,89 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from django_units.models import DataVersion, Recipe
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(":".join(map(str, parts)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional(get_validators):
+    # get_validators возвращает (etag, last_modified) или (None, None);
+    # при совпадении If-None-Match / If-Modified-Since отвечаем 304,
+    # не вызывая сериализацию
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = get_validators(
+                self, request, *args, **kwargs
+            )
+            if etag is None:
+                return method(self, request, *args, **kwargs)
+            timestamp = None
+            if last_modified is not None:
+                timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if timestamp is not None:
+                    response["Last-Modified"] = http_date(timestamp)
+            response["ETag"] = etag
+            patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def catalog_validators(name):
+    # справочник меняется только вместе с версией набора данных,
+    # параметры поиска входят в адрес запроса
+    def get_validators(view, request, *args, **kwargs):
+        version = DataVersion.get_many([name])[0]
+        etag = make_etag(name, version.version, request.get_full_path())
+        return etag, version.modified
+
+    return get_validators
+
+
+def recipe_validators(view, request, pk=None, **kwargs):
+    # нечисловой pk не проверяется здесь: представление само ответит 404
+    try:
+        recipes = Recipe.objects.filter(pk=pk)
+    except (TypeError, ValueError):
+        return None, None
+    versions = DataVersion.get_many(["tags", "ingredients", "users"])
+    recipe = (
+        recipes.with_user_flags(request.user)
+        .values(
+            "modified",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "is_author_subscribed",
+        )
+        .first()
+    )
+    if recipe is None:
+        return None, None
+    etag = make_etag(
+        "recipe",
+        pk,
+        request.build_absolute_uri("/"),
+        *recipe.values(),
+        *(version.version for version in versions),
+    )
+    # признаки пользователя не имеют времени изменения, поэтому
+    # Last-Modified отдается только анонимным пользователям
+    if request.user.is_authenticated:
+        return etag, None
+    return etag, max(
+        [recipe["modified"]] + [version.modified for version in versions]
+    )
@@ -0,0 +1,74 @@
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.instrumentation import metrics_store
+
+
+class ConnectionStats:
+    # соединения с БД процесса по всем потокам: сколько открыто сейчас,
+    # сколько открыто всего (рост при постоянных соединениях означает,
+    # что они не переиспользуются) и сколько закрыто проверкой
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wrappers = weakref.WeakSet()
+        self.created = 0
+        self.stale = 0
+
+    def add(self, connection):
+        with self.lock:
+            self.wrappers.add(connection)
+            self.created += 1
+
+    def snapshot(self):
+        with self.lock:
+            wrappers = list(self.wrappers)
+            created, stale = self.created, self.stale
+        opened = [
+            wrapper for wrapper in wrappers if wrapper.connection is not None
+        ]
+        return {
+            "open": len(opened),
+            "in_transaction": sum(
+                wrapper.in_atomic_block for wrapper in opened
+            ),
+            "created": created,
+            "stale_closed": stale,
+            "max_age": settings.DATABASES["default"].get("CONN_MAX_AGE", 0),
+        }
+
+
+connection_stats = ConnectionStats()
+metrics_store.register_gauge("db_connections", connection_stats.snapshot)
+
+
+@receiver(connection_created)
+def connection_opened(connection, **kwargs):
+    connection_stats.add(connection)
+
+
+def check_connections():
+    # постоянное соединение могли разорвать сервер БД или PgBouncer;
+    # перед запросом оно проверяется и при необходимости закрывается,
+    # чтобы первый же запрос открыл новое
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
+            with connection_stats.lock:
+                connection_stats.stale += 1
+
+
+@receiver(request_started)
+def request_started_check(**kwargs):
+    check_connections()
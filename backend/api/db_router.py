@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+REPLICAS = [
+    alias for alias in settings.DATABASES if alias.startswith("replica_")
+]
+SAFE_METHODS = ["GET", "HEAD", "OPTIONS"]
+# токен, выданный только что, может еще не дойти до реплики
+PRIMARY_MODELS = ["authtoken.token"]
+STICKY_KEY = "db:primary:{}"
+
+current_routing = ContextVar("current_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self, use_primary):
+        self.use_primary = use_primary
+        self.wrote = False
+        # одна реплика на запрос: основной запрос и его prefetch_related
+        # читают данные с одинаковым отставанием
+        self.replica = None
+
+
+class ReplicaRouter:
+    # чтение безопасными запросами идет на реплику, запись и все, что
+    # прочитано после нее в том же запросе, - на основную БД; вне
+    # запросов (команды управления) используется только основная БД
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if (
+            not REPLICAS
+            or state is None
+            or state.use_primary
+            or model._meta.label_lower in PRIMARY_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(REPLICAS)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.use_primary = True
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in REPLICAS
+
+
+@contextmanager
+def read_primary():
+    # кэши и индексы в памяти заполняются с основной БД: прочитанное с
+    # отстающей реплики оставалось бы в них и после того, как реплика
+    # догонит основную
+    token = current_routing.set(None)
+    try:
+        yield
+    finally:
+        current_routing.reset(token)
+
+
+def get_sticky_key(request):
+    # клиент определяется по токену: после записи его чтения несколько
+    # секунд идут на основную БД, пока реплики догоняют ее
+    authorization = request.META.get("HTTP_AUTHORIZATION")
+    if not authorization:
+        return None
+    return STICKY_KEY.format(hashlib.sha1(authorization.encode()).hexdigest())
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not REPLICAS:
+            return self.get_response(request)
+        state = self.get_state(request)
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        self.remember_write(request, state)
+        return response
+
+    async def __acall__(self, request):
+        if not REPLICAS:
+            return await self.get_response(request)
+        state = self.get_state(request)
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        self.remember_write(request, state)
+        return response
+
+    def get_state(self, request):
+        if request.method not in SAFE_METHODS:
+            return RoutingState(use_primary=True)
+        key = get_sticky_key(request)
+        return RoutingState(use_primary=bool(key and cache.get(key)))
+
+    def remember_write(self, request, state):
+        key = get_sticky_key(request)
+        if state.wrote and key and settings.DB_REPLICA_STICKY_SECONDS:
+            cache.set(key, True, settings.DB_REPLICA_STICKY_SECONDS)
@@ -0,0 +1,77 @@
+import io
+import json
+
+from PIL import Image
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+from rest_framework import serializers
+from rest_framework.utils import html
+
+
+class RecipeImageField(Base64ImageField):
+    # принимает изображение строкой base64 (JSON) или файлом
+    # (multipart/form-data); размер и число пикселей проверяются
+    # до декодирования изображения
+    default_error_messages = {
+        "too_large": "Размер изображения больше {max_bytes} байт.",
+        "too_many_pixels": "Изображение больше {max_pixels} пикселей.",
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            image_format = self.check_pixels(data)
+            # имя файла задаем сами, как и для base64
+            extension = "jpg" if image_format == "jpeg" else image_format
+            if extension not in self.ALLOWED_TYPES:
+                raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+            data.name = f"{self.get_file_name(None)}.{extension}"
+            return super(Base64FieldMixin, self).to_internal_value(data)
+        if isinstance(data, str):
+            # длина base64 дает размер файла без декодирования
+            encoded = data.split(";base64,")[-1]
+            self.check_size(len(encoded) * 3 // 4)
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        self.check_pixels(io.BytesIO(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
+
+    def check_size(self, size):
+        if size > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail("too_large", max_bytes=settings.RECIPE_IMAGE_MAX_BYTES)
+
+    def check_pixels(self, file):
+        # Image.open читает только заголовок, пиксели не декодируются
+        try:
+            image = Image.open(file)
+        except (OSError, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            file.seek(0)
+        width, height = image.size
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail(
+                "too_many_pixels",
+                max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS,
+            )
+        return (image.format or "").lower()
+
+
+class JSONListField(serializers.ListField):
+    # в multipart/form-data список передается строкой JSON
+    def get_value(self, dictionary):
+        if html.is_html_input(dictionary) and self.field_name in dictionary:
+            return dictionary.get(self.field_name)
+        return super().get_value(dictionary)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                self.fail("not_a_list", input_type=type(data).__name__)
+        return super().to_internal_value(data)
@@ -0,0 +1,82 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from django_units.models import DataVersion, Ingredient
+
+from api.db_router import read_primary
+
+
+def normalize(name):
+    return name.strip().casefold().replace("ё", "е")
+
+
+class IngredientPrefixIndex:
+    # отсортированный список нормализованных названий ингредиентов;
+    # поиск по префиксу - двоичный поиск по списку
+    def __init__(self):
+        self.lock = threading.Lock()
+        # пара (ключи, записи) публикуется одним присваиванием, и
+        # читатель берёт её целиком, поэтому потоки, уже начавшие поиск,
+        # дорабатывают по прежней паре
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+
+    def is_stale(self, version):
+        # индекс строится для версии набора ингредиентов из БД: ее
+        # увеличивают и сигналы ингредиентов, и загрузка import_ingredients
+        # без сигналов, в том числе в других процессах
+        return (
+            self.index is None
+            or self.version != version
+            or time.monotonic() - self.built_at
+            > settings.INGREDIENT_INDEX_MAX_AGE
+        )
+
+    def build(self, version):
+        with read_primary():
+            ingredients = list(
+                Ingredient.objects.values_list(
+                    "id", "name", "measurement_unit"
+                )
+            )
+        rows = sorted(
+            (normalize(name), name, ingredient_id, measurement_unit)
+            for ingredient_id, name, measurement_unit in ingredients
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {"id": row[2], "name": row[1], "measurement_unit": row[3]}
+            for row in rows
+        ]
+        self.index = (keys, items)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def search(self, query, limit):
+        version = DataVersion.get_many(["ingredients"])[0].version
+        index = self.index
+        if index is None or self.is_stale(version):
+            with self.lock:
+                if self.is_stale(version):
+                    self.build(version)
+                index = self.index
+        keys, items = index
+        query = normalize(query)
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + "\uffff", lo=start)
+        # точные совпадения идут первыми, затем остальные по префиксу
+        exact = []
+        prefix = []
+        for position in range(start, end):
+            if keys[position] == query:
+                exact.append(items[position])
+            elif len(exact) + len(prefix) < limit:
+                prefix.append(items[position])
+        return (exact + prefix)[:limit]
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from rest_framework import serializers
+
+
+logger = logging.getLogger(__name__)
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsStore:
+    # накопленные в процессе показатели по действиям представлений
+    samples_size = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.actions = defaultdict(self.new_action)
+        self.gauges = {}
+
+    def new_action(self):
+        return {
+            "requests": 0,
+            "queries": 0,
+            "max_queries": 0,
+            "db_time": 0.0,
+            "serialize_time": 0.0,
+            "total_time": 0.0,
+            "samples": deque(maxlen=self.samples_size),
+        }
+
+    def record(self, action, metrics, total_time):
+        with self.lock:
+            stats = self.actions[action]
+            stats["requests"] += 1
+            stats["queries"] += metrics.queries
+            stats["max_queries"] = max(stats["max_queries"], metrics.queries)
+            stats["db_time"] += metrics.db_time
+            stats["serialize_time"] += metrics.serialize_time
+            stats["total_time"] += total_time
+            stats["samples"].append(total_time)
+
+    def register_gauge(self, name, get_value):
+        # внешние показатели (например, пул соединений) снимаются
+        # в момент запроса сводки
+        self.gauges[name] = get_value
+
+    def snapshot(self):
+        with self.lock:
+            actions = {
+                action: dict(stats, samples=sorted(stats["samples"]))
+                for action, stats in self.actions.items()
+            }
+        result = {"actions": {}, "gauges": {}}
+        for action, stats in actions.items():
+            samples = stats.pop("samples")
+            requests = stats["requests"]
+            result["actions"][action] = {
+                "requests": requests,
+                "avg_queries": stats["queries"] / requests,
+                "max_queries": stats["max_queries"],
+                "avg_db_ms": stats["db_time"] / requests * 1000,
+                "avg_serialize_ms": stats["serialize_time"] / requests * 1000,
+                "avg_total_ms": stats["total_time"] / requests * 1000,
+                "p50_total_ms": percentile(samples, 50) * 1000,
+                "p95_total_ms": percentile(samples, 95) * 1000,
+            }
+        for name, get_value in self.gauges.items():
+            result["gauges"][name] = get_value()
+        return result
+
+    def reset(self):
+        with self.lock:
+            self.actions.clear()
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+metrics_store = MetricsStore()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.execute_wrapper(execute, sql, params, many, context)
+
+
+# обертка ставится на каждое соединение при его открытии, поэтому
+# учитываются запросы из любого потока, в котором выполняется
+# представление (в том числе из пула потоков в режиме ASGI)
+@receiver(connection_created)
+def install_execute_wrapper(connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+class InstrumentationMiddleware:
+    # считает запросы к БД, время БД, сериализации и всего запроса
+    # для каждого действия (recipes-list, users-subscriptions, ...);
+    # работает и в синхронном, и в асинхронном стеке обработчиков
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # как в MiddlewareMixin: обработчик распознается как async
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.process_metrics(request, response, metrics)
+
+    def process_metrics(self, request, response, metrics):
+        resolver_match = request.resolver_match
+        if resolver_match is None or not resolver_match.url_name:
+            return response
+        # чтение учитывается по имени адреса, запись - с указанием метода
+        action = resolver_match.url_name
+        if request.method not in ["GET", "HEAD"]:
+            action = f"{action} {request.method}"
+        total_time = metrics.total_time
+        metrics_store.record(action, metrics, total_time)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} '
+                f'queries", serialize;dur={metrics.serialize_time * 1000:.1f}'
+                f", total;dur={total_time * 1000:.1f}"
+            )
+        self.check_budget(action, metrics.queries)
+        return response
+
+    def check_budget(self, action, queries):
+        budget = settings.QUERY_BUDGETS.get(action)
+        if budget is None or queries <= budget:
+            return
+        message = f"{action}: {queries} запросов к БД при бюджете {budget}"
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def install_serializer_timing():
+    # время сериализации считается по верхнему уровню: вложенные
+    # сериализаторы входят во время внешнего
+    to_representation = serializers.Serializer.to_representation
+    if getattr(to_representation, "timed", False):
+        return
+
+    def timed_to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serialize_depth:
+            return to_representation(self, instance)
+        metrics.serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+            metrics.serialize_depth -= 1
+
+    timed_to_representation.timed = True
+    serializers.Serializer.to_representation = timed_to_representation
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import (
+    CASES,
+    format_results,
+    get_change,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер задержек (p50/p95) и числа запросов к БД для эндпоинтов API "
+        "через тестовый клиент DRF на текущей базе данных"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Очищать кэш перед каждым запросом",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=[name for name, url in CASES],
+            help="Замерять только указанные эндпоинты",
+        )
+        parser.add_argument("--output", help="Сохранить результаты в JSON")
+        parser.add_argument(
+            "--baseline", help="Сравнить с ранее сохраненными результатами"
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Допустимый рост p50 в процентах относительно --baseline",
+        )
+
+    def handle(self, *args, **options):
+        cases = CASES
+        if options["only"]:
+            cases = [case for case in CASES if case[0] in options["only"]]
+        results = run_benchmark(
+            cases, options["iterations"], options["warmup"], options["cold"]
+        )
+        baseline = None
+        if options["baseline"]:
+            baseline = load_results(options["baseline"])
+        self.stdout.write(format_results(results, baseline))
+        if options["output"]:
+            save_results(results, options["output"])
+        if baseline and options["max_regression"] is not None:
+            regressions = [
+                name
+                for name, result in results.items()
+                if name in baseline
+                and get_change(result, baseline[name])
+                > options["max_regression"]
+            ]
+            if regressions:
+                raise CommandError(
+                    "Регрессия производительности: " + ", ".join(regressions)
+                )
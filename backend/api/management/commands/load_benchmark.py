@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmark import (
+    CASES,
+    LOAD_CASES,
+    format_load_results,
+    load_results,
+    run_load,
+    save_results,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон запущенного сервера: запросы в секунду и "
+        "задержки при параллельных клиентах; для сравнения режимов "
+        "SERVER_MODE сохраните результаты одного и передайте их в "
+        "--baseline при прогоне другого"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", default="http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10,
+            help="Длительность прогона каждого эндпоинта, секунды",
+        )
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=[name for name, url in CASES],
+            default=LOAD_CASES,
+        )
+        parser.add_argument("--output", help="Сохранить результаты в JSON")
+        parser.add_argument(
+            "--baseline", help="Сравнить с ранее сохраненными результатами"
+        )
+
+    def handle(self, *args, **options):
+        cases = [case for case in CASES if case[0] in options["only"]]
+        results = run_load(
+            options["server"],
+            cases,
+            options["concurrency"],
+            options["duration"],
+        )
+        baseline = None
+        if options["baseline"]:
+            baseline = load_results(options["baseline"])
+        self.stdout.write(format_load_results(results, baseline))
+        if options["output"]:
+            save_results(results, options["output"])
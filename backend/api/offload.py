@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from api.db_connections import check_connections
+
+
+# в Django 3.2 нет асинхронного ORM: в режиме ASGI представления чтения
+# выполняются в отдельном пуле потоков, а цикл событий тем временем
+# принимает другие запросы; синхронные представления Django выполняет
+# в одном общем потоке, что при ASGI превращает их в очередь
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix="view"
+)
+
+
+def run_view(view, request, args, kwargs):
+    # соединения потоков пула обслуживаются так же, как соединение
+    # синхронного воркера в начале и конце запроса (CONN_MAX_AGE)
+    close_old_connections()
+    check_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        # ответ DRF отрисовывается здесь же, а не в общем потоке
+        if hasattr(response, "render") and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def offload(view):
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            executor, context.run, run_view, view, request, args, kwargs
+        )
+
+    return async_view
+
+
+def offload_urls(urlpatterns, names):
+    # заменяет представления адресов с указанными именами асинхронными
+    return [
+        URLPattern(
+            pattern.pattern,
+            offload(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in urlpatterns
+    ]
+
+
+def close_stream(response):
+    # закрывает генератор ответа (и курсор БД) и соединения потока,
+    # который после этого завершается
+    try:
+        response.close()
+    finally:
+        connections.close_all()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    # ASGIHandler Django 3.2 перебирает потоковый ответ прямо в цикле
+    # событий, и генератор, читающий БД (выгрузка списка покупок),
+    # падает с SynchronousOnlyOperation. Здесь части ответа читаются в
+    # отдельном потоке, одном на весь ответ: серверный курсор остается
+    # в потоке и соединении, где был открыт
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode("ascii")
+            if isinstance(value, str):
+                value = value.encode("latin1")
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            cookie = cookie.output(header="").encode("ascii").strip()
+            headers.append((b"Set-Cookie", cookie))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": headers,
+            }
+        )
+        loop = asyncio.get_running_loop()
+        stream = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+        parts = iter(response)
+        try:
+            while True:
+                part = await loop.run_in_executor(stream, next, parts, None)
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": True,
+                        }
+                    )
+            await send({"type": "http.response.body"})
+        finally:
+            await loop.run_in_executor(stream, close_stream, response)
+            stream.shutdown(wait=False)
@@ -1,8 +1,156 @@
+import base64
+import json
+from functools import reduce
+
 from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # постраничный вывод по ключу (курсору): страница выбирается условием
+    # на поля сортировки, а не OFFSET, и без COUNT(*), поэтому дальние
+    # страницы стоят столько же, сколько первая
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор"
+
+    def __init__(self, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self.parse_position(queryset, position)
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.get_position(self.results[-1]), False)
 
-from rest_framework.pagination import PageNumberPagination
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.results:
+            return remove_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param
+            )
+        return self.encode_cursor(self.get_position(self.results[0]), True)
+
+    def get_position(self, obj):
+        return [
+            str(getattr(obj, field.lstrip("-"))) for field in self.ordering
+        ]
+
+    def parse_position(self, queryset, position):
+        # значения курсора приходят от клиента строками и приводятся к
+        # типам полей сортировки (полей модели или аннотаций) до того,
+        # как попадут в условие запроса
+        values = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            if name in queryset.query.annotations:
+                model_field = queryset.query.annotations[name].output_field
+            else:
+                model_field = queryset.model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else "-" + field
+
+    @staticmethod
+    def after(ordering, position):
+        # (a, b) после (x, y): a за x, либо a = x и b за y
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip("-"): value})
+            conditions.append(condition)
+        return reduce(lambda a, b: a | b, conditions)
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({"p": position, "r": int(reverse)})
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded,
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size = settings.DEFAULT_PAGINATION_PAGE_SIZE
     page_size_query_param = "limit"
+
+    # ?pagination=cursor включает постраничный вывод по ключу для
+    # представлений, у которых задан cursor_ordering
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering and request.query_params.get("pagination") == "cursor":
+            self.keyset = KeysetPagination(
+                ordering, self.get_page_size(request)
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
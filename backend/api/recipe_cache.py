@@ -0,0 +1,180 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from django_units.models import DataVersion, Recipe
+
+from api.db_router import read_primary
+from api.serializers import RecipeSerializer
+
+
+# ключ собирается из состояния БД: времени изменения рецепта и версий
+# тэгов, ингредиентов и пользователей (авторов), которые входят в
+# представление многих рецептов. Поэтому кэш не нужно сбрасывать, и
+# каждый процесс с собственным LocMemCache видит изменения, сделанные
+# другими. Представление содержит абсолютные ссылки на изображения,
+# поэтому ключ включает схему и хост запроса
+CATALOG_DATA = ["tags", "ingredients", "users"]
+RECIPE_KEY = "recipes:{catalog}:{origin}:{id}:{modified}"
+
+
+def get_keys(recipe_versions, origin):
+    catalog = ".".join(
+        str(version.version) for version in DataVersion.get_many(CATALOG_DATA)
+    )
+    return {
+        recipe_id: RECIPE_KEY.format(
+            catalog=catalog,
+            origin=origin,
+            id=recipe_id,
+            modified=modified.timestamp(),
+        )
+        for recipe_id, modified in recipe_versions.items()
+    }
+
+
+def get_user_flags(recipe_ids, user):
+    if not user.is_authenticated:
+        return {}
+    return {
+        recipe_id: flags
+        for recipe_id, *flags in Recipe.objects.filter(id__in=recipe_ids)
+        .with_user_flags(user)
+        .values_list(
+            "id",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "is_author_subscribed",
+        )
+    }
+
+
+def get_recipes_data(recipes, request, fields=None, expand=None):
+    # у рецептов должно быть загружено поле modified
+    return get_recipes_data_by_version(
+        {recipe.id: recipe.modified for recipe in recipes},
+        request,
+        fields,
+        expand,
+    )
+
+
+def get_recipes_data_by_id(recipe_ids, request, fields=None, expand=None):
+    # время изменения читается одним запросом; удаленные рецепты
+    # пропускаются
+    modified = dict(
+        Recipe.objects.filter(id__in=recipe_ids).values_list("id", "modified")
+    )
+    return get_recipes_data_by_version(
+        {
+            recipe_id: modified[recipe_id]
+            for recipe_id in recipe_ids
+            if recipe_id in modified
+        },
+        request,
+        fields,
+        expand,
+    )
+
+
+def compact(item, fields, expand):
+    # выборка полей из полного представления рецепта, как их выводит
+    # RecipeSerializer с fields= и expand=
+    result = {}
+    for field in RecipeSerializer.Meta.fields:
+        if field not in fields:
+            continue
+        value = item[field]
+        if field not in expand:
+            if field == "author":
+                value = value["id"]
+            elif field == "tags":
+                value = [tag["id"] for tag in value]
+            elif field == "ingredients":
+                value = [
+                    {"id": ingredient["id"], "amount": ingredient["amount"]}
+                    for ingredient in value
+                ]
+        result[field] = value
+    return result
+
+
+def serialize_recipes(recipe_ids, request, fields=None, expand=None):
+    queryset = Recipe.objects.filter(id__in=recipe_ids)
+    if fields is None:
+        queryset = queryset.with_related()
+    else:
+        queryset = queryset.with_fields(fields, expand)
+    serializer = RecipeSerializer(
+        queryset.with_user_flags(AnonymousUser()),
+        many=True,
+        context={"request": request},
+        fields=fields,
+        expand=expand,
+    )
+    with read_primary():
+        return {item["id"]: item for item in serializer.data}
+
+
+def get_recipes_data_by_version(
+    recipe_versions, request, fields=None, expand=None
+):
+    # общая для всех пользователей часть берется из кэша, недостающие
+    # рецепты сериализуются одним пакетом, затем накладываются признаки
+    # текущего пользователя; удаленные рецепты пропускаются. При
+    # fields= недостающие рецепты сериализуются только в нужных полях
+    # и в кэш не попадают
+    recipe_ids = list(recipe_versions)
+    keys = get_keys(recipe_versions, request.build_absolute_uri("/"))
+    cached = cache.get_many(keys.values())
+    items = {
+        recipe_id: cached[keys[recipe_id]]
+        for recipe_id in recipe_ids
+        if keys[recipe_id] in cached
+    }
+    missing_ids = [
+        recipe_id for recipe_id in recipe_ids if recipe_id not in items
+    ]
+    if fields is not None:
+        expand = expand or []
+        fields = ["id"] + [field for field in fields if field != "id"]
+        items = {
+            recipe_id: compact(item, fields, expand)
+            for recipe_id, item in items.items()
+        }
+        if missing_ids:
+            items.update(
+                serialize_recipes(missing_ids, request, fields, expand)
+            )
+    elif missing_ids:
+        fresh = serialize_recipes(missing_ids, request)
+        cache.set_many(
+            {keys[recipe_id]: item for recipe_id, item in fresh.items()},
+            settings.RECIPE_CACHE_TIMEOUT,
+        )
+        items.update(fresh)
+    with_author = fields is None or (
+        "author" in fields and "author" in expand
+    )
+    with_flags = (
+        fields is None
+        or with_author
+        or {"is_favorited", "is_in_shopping_cart"} & set(fields)
+    )
+    user_flags = get_user_flags(recipe_ids, request.user) if with_flags else {}
+    data = []
+    for recipe_id in recipe_ids:
+        if recipe_id not in items:
+            continue
+        item = dict(items[recipe_id])
+        is_favorited, is_in_shopping_cart, is_subscribed = user_flags.get(
+            recipe_id, (False, False, False)
+        )
+        if "is_favorited" in item:
+            item["is_favorited"] = is_favorited
+        if "is_in_shopping_cart" in item:
+            item["is_in_shopping_cart"] = is_in_shopping_cart
+        if with_author and "author" in item:
+            item["author"] = dict(item["author"], is_subscribed=is_subscribed)
+        data.append(item)
+    return data
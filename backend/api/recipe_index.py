@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django_units.models import Recipe, RecipeIngredient
+from django_units.transactions import on_commit_once
+
+from api.db_router import read_primary
+
+
+# версия индекса в общем кэше: процесс, изменивший рецепт, обновляет
+# свой индекс на месте, остальные перестраивают его при смене версии;
+# массовые загрузки без сигналов учитываются перестройкой по возрасту
+INDEX_VERSION_KEY = "recipes:ingredient-index:version"
+
+
+class RecipeIngredientIndex:
+    # обратный индекс: ингредиент -> множество рецептов с ним
+    # (списки вхождений), и ингредиенты каждого рецепта. Пара
+    # (postings, recipe_ingredients) публикуется одним присваиванием и
+    # после этого не меняется, поэтому поиск читает ее без блокировки
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+
+    def get_version(self):
+        version = cache.get(INDEX_VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            cache.set(INDEX_VERSION_KEY, version, None)
+        return version
+
+    def is_stale(self, version):
+        return (
+            self.index is None
+            or self.version != version
+            or time.monotonic() - self.built_at
+            > settings.RECIPE_INDEX_MAX_AGE
+        )
+
+    def build(self, version):
+        postings = defaultdict(set)
+        recipe_ingredients = defaultdict(set)
+        with read_primary():
+            rows = list(
+                RecipeIngredient.objects.values_list(
+                    "recipe_id", "ingredient_id"
+                )
+            )
+        for recipe_id, ingredient_id in rows:
+            postings[ingredient_id].add(recipe_id)
+            recipe_ingredients[recipe_id].add(ingredient_id)
+        self.index = dict(postings), dict(recipe_ingredients)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        # возвращает опубликованный индекс, при необходимости перестроив
+        version = self.get_version()
+        index = self.index
+        if index is None or self.is_stale(version):
+            with self.lock:
+                if self.is_stale(version):
+                    self.build(version)
+                index = self.index
+        return index
+
+    def update(self, recipe_ids):
+        # перечитывает ингредиенты изменившихся рецептов одним запросом
+        # и публикует индекс с новыми списками вхождений
+        current = defaultdict(set)
+        with read_primary():
+            rows = list(
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=recipe_ids
+                ).values_list("recipe_id", "ingredient_id")
+            )
+        for recipe_id, ingredient_id in rows:
+            current[recipe_id].add(ingredient_id)
+        version = time.time_ns()
+        with self.lock:
+            # индекс, отставший от изменений других процессов, не
+            # дополняется, а перестраивается при следующем поиске
+            if self.version != cache.get(INDEX_VERSION_KEY):
+                self.index = None
+            if self.index is not None:
+                self.index = updated_index(self.index, recipe_ids, current)
+                self.version = version
+            cache.set(INDEX_VERSION_KEY, version, None)
+
+    def search(self, ingredient_ids, max_missing=None):
+        # рецепты, в которых есть хотя бы один из ингредиентов, по
+        # возрастанию числа недостающих, затем по числу совпавших;
+        # возвращает список (id рецепта, совпало, не хватает)
+        postings, recipe_ingredients = self.ensure_built()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, count in matched.items():
+            missing = len(recipe_ingredients.get(recipe_id, ())) - count
+            if max_missing is None or missing <= max_missing:
+                results.append((recipe_id, count, missing))
+        results.sort(key=lambda result: (result[2], -result[1], -result[0]))
+        return results
+
+
+def updated_index(index, recipe_ids, current):
+    # копия индекса с ингредиентами рецептов из current; словари и
+    # изменившиеся списки вхождений копируются, остальные списки общие
+    postings, recipe_ingredients = dict(index[0]), dict(index[1])
+    copied = set()
+    for recipe_id in recipe_ids:
+        old = recipe_ingredients.pop(recipe_id, set())
+        new = current.get(recipe_id, set())
+        for ingredient_id in old ^ new:
+            if ingredient_id not in copied:
+                postings[ingredient_id] = set(postings.get(ingredient_id, ()))
+                copied.add(ingredient_id)
+            if ingredient_id in new:
+                postings[ingredient_id].add(recipe_id)
+            else:
+                postings[ingredient_id].discard(recipe_id)
+        if new:
+            recipe_ingredients[recipe_id] = new
+    return postings, recipe_ingredients
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
+
+
+def update_recipe_index(recipe_ids):
+    # после фиксации транзакции, когда записаны все строки рецептов;
+    # изменения в одной транзакции дают одно обновление индекса
+    on_commit_once(recipe_ingredient_index.update, recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    update_recipe_index([instance.id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    update_recipe_index([instance.recipe_id])
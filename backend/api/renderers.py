@@ -1,22 +1,146 @@
-import io
+import csv
+import tempfile
+
+from django.conf import settings
 
 from rest_framework import renderers
 
+# orjson - необязательная зависимость, без нее используется stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    # тот же компактный UTF-8 вывод без экранирования кириллицы, что и
+    # у JSONRenderer, но кодирование через orjson; типы, которых orjson
+    # не знает (Decimal, ленивые строки), передаются кодировщику DRF
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+        # как JSONRenderer, экранируем разделители строк для JavaScript
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
 
 class DownloadRenderer(renderers.BaseRenderer):
     media_type = "text/plain"
     format = "txt"
+    charset = "utf-8"
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        text_buffer = io.StringIO()
-        text_buffer.write("--- Список ингредиентов для покупки ---\n")
-        for d in data:
-            text_buffer.write(
-                str(dict(d).get("ingredient_name"))
-                + " "
-                + str(dict(d).get("total_amount"))
-                + " "
-                + str(dict(d).get("measurement_unit"))
-                + "\n"
+        return b"".join(self.stream(data))
+
+    def stream(self, rows):
+        # строки выдаются пачками, чтобы не держать весь список в памяти
+        chunk = [self.render_header()]
+        for row in rows:
+            chunk.append(self.render_row(row))
+            if len(chunk) >= settings.SHOPPING_CART_CHUNK_SIZE:
+                yield "".join(chunk).encode(self.charset)
+                chunk = []
+        if chunk:
+            yield "".join(chunk).encode(self.charset)
+
+    def render_header(self):
+        return "--- Список ингредиентов для покупки ---\n"
+
+    def render_row(self, row):
+        return (
+            str(row.get("ingredient_name"))
+            + " "
+            + str(row.get("total_amount"))
+            + " "
+            + str(row.get("measurement_unit"))
+            + "\n"
+        )
+
+
+class Echo:
+    # csv.writer пишет в буфер, а writerow сразу возвращает строку
+    def write(self, value):
+        return value
+
+
+class CsvDownloadRenderer(DownloadRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def render_header(self):
+        return self.writer.writerow(
+            ["ingredient_name", "total_amount", "measurement_unit"]
+        )
+
+    def render_row(self, row):
+        return self.writer.writerow(
+            [
+                row.get("ingredient_name"),
+                row.get("total_amount"),
+                row.get("measurement_unit"),
+            ]
+        )
+
+
+class PdfDownloadRenderer(DownloadRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    font_name = "ShoppingCartFont"
+    font_size = 12
+    margin = 40
+
+    def stream(self, rows):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_CART_PDF_FONT)
             )
-        return text_buffer.getvalue()
+        # документ пишется во временный файл, который держится в памяти
+        # только до SHOPPING_CART_PDF_SPOOL_SIZE байт, и отдается кусками
+        chunk_size = settings.SHOPPING_CART_PDF_SPOOL_SIZE
+        with tempfile.SpooledTemporaryFile(max_size=chunk_size) as pdf_file:
+            pdf = canvas.Canvas(pdf_file, pagesize=A4)
+            width, height = A4
+            y = height - self.margin
+            pdf.setFont(self.font_name, self.font_size)
+            pdf.drawString(self.margin, y, self.render_header().strip())
+            for row in rows:
+                y -= self.font_size * 1.5
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(self.font_name, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, self.render_row(row).strip())
+            pdf.save()
+            pdf_file.seek(0)
+            chunk = pdf_file.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = pdf_file.read(chunk_size)
+
+
+def get_download_renderers():
+    download_renderers = [DownloadRenderer(), CsvDownloadRenderer()]
+    # reportlab - необязательная зависимость, без нее pdf недоступен
+    try:
+        import reportlab  # noqa: F401
+    except ImportError:
+        return download_renderers
+    return download_renderers + [PdfDownloadRenderer()]
@@ -1,22 +1,21 @@
 import re
 
-from drf_extra_fields.fields import Base64ImageField
-
 from django.contrib.auth import get_user_model
-from django.db.models import F
 
 from rest_framework import serializers
 
+from django_units.images import get_variant_urls
 from django_units.models import (
     Ingredient,
     Tag,
     Recipe,
-    RecipeIngredient,
     FavoriteRecipe,
     ShoppingCart,
     Subscriber,
 )
 
+from api.fields import JSONListField, RecipeImageField
+
 
 User = get_user_model()
 
@@ -36,6 +35,9 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        # признак может быть уже вычислен запросом списка
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         return (
             request.user.is_authenticated
@@ -100,7 +102,17 @@ class TagSerializer(serializers.ModelSerializer):
         ]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin(serializers.Serializer):
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        request = self.context.get("request")
+        if request is None:
+            return get_variant_urls(obj, lambda url: url)
+        return get_variant_urls(obj, request.build_absolute_uri)
+
+
+class RecipeSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = UserSerializer(many=False)
     ingredients = serializers.SerializerMethodField()
@@ -118,27 +130,71 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         ]
 
+    # вложенные объекты, которые без expand= выводятся компактно
+    COMPACT_FIELDS = ["author", "tags", "ingredients"]
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        # fields= оставляет только перечисленные поля; author, tags и
+        # ingredients без expand= выводятся как id (ингредиенты - id и
+        # количество)
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            return
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+        compact_fields = {
+            "author": serializers.IntegerField(source="author_id"),
+            "tags": serializers.PrimaryKeyRelatedField(
+                many=True, read_only=True
+            ),
+            "ingredients": serializers.SerializerMethodField(
+                method_name="get_ingredient_amounts"
+            ),
+        }
+        for name, field in compact_fields.items():
+            if name in self.fields and name not in (expand or []):
+                self.fields[name] = field
+
+    def to_representation(self, instance):
+        # передаем аннотированный признак подписки вложенному автору
+        if hasattr(instance, "is_author_subscribed") and isinstance(
+            self.fields.get("author"), UserSerializer
+        ):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
+
+    def get_ingredient_amounts(self, obj):
+        return [
+            {
+                "id": recipe_ingredient.ingredient_id,
+                "amount": recipe_ingredient.amount,
+            }
+            for recipe_ingredient in obj.recipeingredient_set.all()
+        ]
+
     def get_ingredients(self, obj):
-        return (
-            RecipeIngredient.objects.filter(recipe=obj)
-            .select_related("ingredient")
-            .values(
-                "ingredient__id",
-                "ingredient__name",
-                "ingredient__measurement_unit",
-                "amount",
+        # ингредиенты берутся из prefetch_related, если он был сделан
+        ingredients = []
+        for recipe_ingredient in obj.recipeingredient_set.all():
+            ingredient = recipe_ingredient.ingredient
+            ingredients.append(
+                {
+                    "id": ingredient.id,
+                    "name": ingredient.name,
+                    "measurement_unit": ingredient.measurement_unit,
+                    "amount": recipe_ingredient.amount,
+                }
             )
-            .annotate(id=F("ingredient__id"))
-            .annotate(name=F("ingredient__name"))
-            .annotate(measurement_unit=F("ingredient__measurement_unit"))
-            .values("id", "name", "measurement_unit", "amount")
-        )
+        return ingredients
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         request = self.context.get("request")
         return (
             request.user.is_authenticated
@@ -148,6 +204,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         request = self.context.get("request")
         return (
             request.user.is_authenticated
@@ -158,8 +216,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeCreateRequestSerializer(serializers.ModelSerializer):
-    ingredients = serializers.ListField(child=serializers.DictField())
-    image = Base64ImageField()
+    ingredients = JSONListField(child=serializers.DictField())
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -176,34 +234,31 @@ class RecipeCreateRequestSerializer(serializers.ModelSerializer):
         ingredient_ids = [ingredient["id"] for ingredient in ingredients]
         if len(set(ingredient_ids)) < len(ingredient_ids):
             raise serializers.ValidationError("Дубли ингредиентов")
-        if len(Ingredient.objects.in_bulk(ingredient_ids)) < len(
-            ingredient_ids
-        ):
+        ingredient_objects = Ingredient.objects.in_bulk(ingredient_ids)
+        if len(ingredient_objects) < len(ingredient_ids):
             raise serializers.ValidationError("Не существующие ингредиенты")
+        # сохраняем загруженные объекты, чтобы не читать их повторно
+        for ingredient in ingredients:
+            ingredient_id = int(ingredient["id"])
+            ingredient["ingredient"] = ingredient_objects[ingredient_id]
         return ingredients
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = [
             "id",
             "name",
             "image",
+            "image_variants",
             "cooking_time",
         ]
 
 
-class DownloadSerializer(serializers.Serializer):
-    ingredient_name = serializers.CharField()
-    total_amount = serializers.IntegerField()
-    measurement_unit = serializers.CharField()
-
-
 class SubscriberSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -219,6 +274,8 @@ class SubscriberSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         return (
             request.user.is_authenticated
@@ -228,11 +285,13 @@ class SubscriberSerializer(serializers.ModelSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        recipes_limit = int(request.GET.get("recipes_limit", 99999))
-        queryset = Recipe.objects.filter(author=obj)[:recipes_limit]
+        # рецепты могут быть уже подгружены списком подписок
+        if hasattr(obj, "recipes"):
+            queryset = obj.recipes
+        else:
+            request = self.context.get("request")
+            recipes_limit = int(request.GET.get("recipes_limit", 99999))
+            queryset = Recipe.objects.filter(author=obj)[:recipes_limit]
         serializer = RecipeShortSerializer(instance=queryset, many=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
@@ -0,0 +1,97 @@
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from django.test import TransactionTestCase
+
+from rest_framework.authtoken.models import Token
+
+from api.offload import StreamingASGIHandler
+from django_units.models import (
+    CustomUser,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+
+
+# запросы идут напрямую в ASGI-приложение, как в режиме
+# SERVER_MODE=async; соединения потоков обработчика не видят
+# транзакцию TestCase, поэтому данные фиксируются
+class StreamingASGITests(TransactionTestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.token = Token.objects.create(user=user).key
+        recipe = Recipe.objects.create(
+            author=user,
+            name="Рецепт",
+            text="Описание",
+            image="recipes/images/test.png",
+            # варианты изображения считаются созданными
+            image_variants={"source": "recipes/images/test.png"},
+            cooking_time=10,
+        )
+        for name, amount in [("сахар", 100), ("мука", 200)]:
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit="г"
+                ),
+                amount=amount,
+            )
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    @async_to_sync
+    async def request(self, path, query_string=b""):
+        communicator = ApplicationCommunicator(
+            StreamingASGIHandler(),
+            {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query_string,
+                "root_path": "",
+                "headers": [
+                    (b"host", b"testserver"),
+                    (b"authorization", f"Token {self.token}".encode()),
+                ],
+                "client": ("127.0.0.1", 10000),
+                "server": ("testserver", 80),
+            },
+        )
+        await communicator.send_input(
+            {"type": "http.request", "body": b"", "more_body": False}
+        )
+        start = await communicator.receive_output(timeout=10)
+        body = b""
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await communicator.wait()
+        return start["status"], body
+
+    def test_shopping_cart_download_streams_from_database(self):
+        status, body = self.request(
+            "/api/recipes/download_shopping_cart/", b"format=txt"
+        )
+        self.assertEqual(status, 200)
+        content = body.decode()
+        self.assertIn("мука 200 г", content)
+        self.assertIn("сахар 100 г", content)
+
+    def test_regular_responses_are_sent_unchanged(self):
+        status, body = self.request("/api/tags/")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b"[]")
@@ -0,0 +1,10 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+
+class RecipeValidatorsTests(TestCase):
+    def test_non_numeric_pk_is_not_found(self):
+        response = APIClient().get("/api/recipes/abc/")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response)
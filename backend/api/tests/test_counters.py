@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from django_units.models import CustomUser, FavoriteRecipe, Recipe
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name="Рецепт",
+            text="Описание",
+            image="recipes/images/test.png",
+            # варианты изображения считаются созданными
+            image_variants={"source": "recipes/images/test.png"},
+            cooking_time=10,
+        )
+
+    def test_favorite_changes_counter(self):
+        favorite = FavoriteRecipe.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        favorite.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_drifted_counter_does_not_go_below_zero(self):
+        favorite = FavoriteRecipe.objects.create(
+            user=self.user, recipe=self.recipe
+        )
+        Recipe.objects.filter(id=self.recipe.id).update(favorites_count=0)
+        favorite.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
@@ -0,0 +1,136 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.db_router import (
+    ReplicaRouter,
+    RoutingState,
+    current_routing,
+    read_primary,
+)
+from django_units.models import CustomUser, Ingredient, Tag
+
+
+REPLICA = "test_replica"
+
+
+# реплика - отдельная тестовая БД с другим содержимым, поэтому по
+# ответу видно, из какой БД он прочитан; TestCase не подходит: внутри
+# его транзакции маршрутизатор всегда читает с основной БД
+@mock.patch("api.db_router.REPLICAS", [REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name="primary", color="#000000", slug="primary")
+        Tag.objects.using(REPLICA).create(
+            name="replica", color="#000000", slug="replica"
+        )
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.client = self.get_client()
+
+    def get_client(self):
+        client = APIClient()
+        token = Token.objects.create(user=self.user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def get_tag_names(self, client):
+        response = client.get("/api/tags/")
+        self.assertEqual(response.status_code, 200)
+        return [tag["name"] for tag in response.json()]
+
+    def write(self, client):
+        response = client.post(
+            "/api/users/set_password/",
+            {
+                "current_password": "password-123",
+                "new_password": "password-456",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.get_tag_names(APIClient()), ["replica"])
+        self.assertEqual(self.get_tag_names(self.client), ["replica"])
+
+    def test_reads_after_write_in_request_use_primary(self):
+        token = current_routing.set(RoutingState(use_primary=False))
+        try:
+            self.assertEqual(
+                list(Tag.objects.values_list("name", flat=True)),
+                ["replica"],
+            )
+            Tag.objects.create(name="new", color="#000000", slug="new")
+            self.assertEqual(
+                list(Tag.objects.values_list("name", flat=True)),
+                ["primary", "new"],
+            )
+        finally:
+            current_routing.reset(token)
+
+    def test_client_reads_primary_within_sticky_window(self):
+        self.write(self.client)
+        self.assertEqual(self.get_tag_names(self.client), ["primary"])
+        # окно привязано к токену: другие клиенты читают с реплики
+        self.assertEqual(self.get_tag_names(APIClient()), ["replica"])
+
+    @override_settings(DB_REPLICA_STICKY_SECONDS=1)
+    def test_client_returns_to_replica_after_sticky_window(self):
+        self.write(self.client)
+        self.assertEqual(self.get_tag_names(self.client), ["primary"])
+        time.sleep(1.1)
+        self.assertEqual(self.get_tag_names(self.client), ["replica"])
+
+    @override_settings(DB_REPLICA_STICKY_SECONDS=0)
+    def test_sticky_window_can_be_disabled(self):
+        self.write(self.client)
+        self.assertEqual(self.get_tag_names(self.client), ["replica"])
+
+    def test_ingredient_index_is_built_from_primary(self):
+        Ingredient.objects.create(name="сахар", measurement_unit="г")
+        Ingredient.objects.using(REPLICA).create(
+            name="сало", measurement_unit="г"
+        )
+        response = APIClient().get("/api/ingredients/", {"name": "са"})
+        self.assertEqual([item["name"] for item in response.data], ["сахар"])
+
+
+class ReplicaChoiceTests(SimpleTestCase):
+    @mock.patch("api.db_router.REPLICAS", ["replica_0", "replica_1"])
+    def test_one_replica_is_used_for_the_whole_request(self):
+        router = ReplicaRouter()
+        token = current_routing.set(RoutingState(use_primary=False))
+        try:
+            aliases = {router.db_for_read(Tag) for _ in range(20)}
+        finally:
+            current_routing.reset(token)
+        self.assertEqual(len(aliases), 1)
+
+    @mock.patch("api.db_router.REPLICAS", ["replica_0"])
+    def test_read_primary_overrides_replica(self):
+        router = ReplicaRouter()
+        token = current_routing.set(RoutingState(use_primary=False))
+        try:
+            with read_primary():
+                self.assertEqual(router.db_for_read(Tag), "default")
+            self.assertEqual(router.db_for_read(Tag), "replica_0")
+        finally:
+            current_routing.reset(token)
@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from django_units.models import (
+    CustomUser,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+
+
+class ShoppingCartDownloadTests(TestCase):
+    url = "/api/recipes/download_shopping_cart/"
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        recipe = Recipe.objects.create(
+            author=user,
+            name="Рецепт",
+            text="Описание",
+            image="recipes/images/test.png",
+            # варианты изображения считаются созданными
+            image_variants={"source": "recipes/images/test.png"},
+            cooking_time=10,
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe,
+            ingredient=Ingredient.objects.create(
+                name="сахар", measurement_unit="г"
+            ),
+            amount=100,
+        )
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_download_by_accept_header(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "сахар,100,г", b"".join(response.streaming_content).decode()
+        )
+
+    def test_unsupported_accept_gets_json_error(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("detail", response.json())
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from django_units.models import DataVersion, Ingredient
+
+
+class IngredientIndexTests(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(
+            name="сахар", measurement_unit="г"
+        )
+        self.client = APIClient()
+
+    def search(self, name):
+        response = self.client.get("/api/ingredients/", {"name": name})
+        return [item["name"] for item in response.data]
+
+    def test_bulk_changes_are_seen_after_version_bump(self):
+        self.assertEqual(self.search("са"), ["сахар"])
+        # import_ingredients пишет пакетами без сигналов и увеличивает
+        # только версию набора данных
+        Ingredient.objects.bulk_create(
+            [Ingredient(name="сало", measurement_unit="г")]
+        )
+        DataVersion.bump("ingredients")
+        self.assertEqual(self.search("са"), ["сало", "сахар"])
+
+    def test_warm_search_reads_only_versions(self):
+        self.search("са")
+        with self.assertNumQueries(2):
+            self.search("са")
@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from django_units.models import CustomUser, Recipe
+
+
+def make_cursor(position, reverse=False):
+    cursor = json.dumps({"p": position, "r": int(reverse)})
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    url = "/api/recipes/?pagination=cursor&limit=2"
+    params = {"pagination": "cursor", "limit": 2}
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="Автор",
+            last_name="Рецептов",
+            password="password-123",
+        )
+        now = timezone.now()
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Описание",
+                image="recipes/images/test.png",
+                # варианты изображения считаются созданными
+                image_variants={"source": "recipes/images/test.png"},
+                cooking_time=10,
+            )
+            for number in range(5)
+        ]
+        # у трех рецептов одинаковое время публикации: порядок среди
+        # них задает id
+        for recipe, minutes in zip(cls.recipes, [5, 4, 4, 4, 1]):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=minutes)
+            )
+        cls.expected = [
+            recipe.pk
+            for recipe in sorted(
+                Recipe.objects.all(),
+                key=lambda recipe: (recipe.pub_date, recipe.pk),
+                reverse=True,
+            )
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.json()["results"]]
+
+    def test_next_links_walk_all_recipes_in_order(self):
+        ids = []
+        url = self.url
+        while url:
+            response = self.client.get(url)
+            ids += self.get_ids(response)
+            url = response.json()["next"]
+        self.assertEqual(ids, self.expected)
+
+    def test_ties_on_pub_date_are_split_by_id(self):
+        first = self.client.get(self.url)
+        second = self.client.get(first.json()["next"])
+        # граница страниц проходит внутри группы с одинаковой датой
+        self.assertEqual(self.get_ids(first), self.expected[:2])
+        self.assertEqual(self.get_ids(second), self.expected[2:4])
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get(self.url)
+        self.assertIsNone(first.json()["previous"])
+        second = self.client.get(first.json()["next"])
+        back = self.client.get(second.json()["previous"])
+        self.assertEqual(self.get_ids(back), self.get_ids(first))
+        self.assertIsNotNone(back.json()["next"])
+
+    def test_malformed_cursors_are_not_found(self):
+        pub_date = "2026-01-01 00:00:00+00:00"
+        cursors = [
+            "not-base64!",
+            base64.urlsafe_b64encode(b"[1, 2]").decode(),
+            make_cursor([pub_date]),
+            make_cursor(["notadate", "1"]),
+            make_cursor([pub_date, "x"]),
+            make_cursor([pub_date, None]),
+            make_cursor([{"a": 1}, "1"]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    "/api/recipes/", dict(self.params, cursor=cursor)
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_popular_ordering_cursor_is_parsed_as_score(self):
+        params = dict(self.params, ordering="popular")
+        response = self.client.get(
+            "/api/recipes/", dict(params, cursor=make_cursor(["x", "1"]))
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            "/api/recipes/", dict(params, cursor=make_cursor(["0.0", "3"]))
+        )
+        self.assertEqual(response.status_code, 200)
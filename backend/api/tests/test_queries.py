@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.instrumentation import QueryBudgetExceeded
+from django_units.models import (
+    CustomUser,
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscriber,
+    Tag,
+)
+
+
+def create_user(name):
+    return CustomUser.objects.create_user(
+        email=f"{name}@example.com",
+        username=name,
+        first_name="Имя",
+        last_name="Фамилия",
+        password="password-123",
+    )
+
+
+class QueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=name, color="#000000", slug=name)
+            for name in ["breakfast", "lunch"]
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ["сахар", "мука", "соль", "масло"]
+        ]
+        cls.user = create_user("user")
+        cls.recipes = []
+        for author_number in range(3):
+            author = create_user(f"author{author_number}")
+            Subscriber.objects.create(user=cls.user, author=author)
+            for recipe_number in range(3):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name=f"Рецепт {recipe_number}",
+                    text="Описание",
+                    image="recipes/images/test.png",
+                    # варианты изображения считаются созданными
+                    image_variants={"source": "recipes/images/test.png"},
+                    cooking_time=10,
+                )
+                recipe.tags.set(tags[: recipe_number + 1])
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe, ingredient=ingredient, amount=10
+                    )
+                    for ingredient in ingredients[: recipe_number + 2]
+                )
+                cls.recipes.append(recipe)
+        FavoriteRecipe.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+        cls.token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def count_queries(self, path, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class QueryCountTests(QueryTestCase):
+    # число запросов не должно зависеть от размера страницы и от числа
+    # тэгов и ингредиентов рецептов
+    def assert_same_for_page_sizes(self, path, params=None):
+        # без кэша и с заполненным кэшем
+        counts = []
+        for limit in [2, 6]:
+            cache.clear()
+            page_params = dict(params or {}, limit=limit)
+            counts.append(
+                (
+                    self.count_queries(path, page_params),
+                    self.count_queries(path, page_params),
+                )
+            )
+        self.assertEqual(counts[0], counts[1])
+
+    def test_recipe_list(self):
+        self.assert_same_for_page_sizes("/api/recipes/")
+
+    def test_recipe_list_with_sparse_fields(self):
+        self.assert_same_for_page_sizes(
+            "/api/recipes/", {"fields": "id,name,tags", "expand": "tags"}
+        )
+
+    def test_recipe_feed(self):
+        self.assert_same_for_page_sizes("/api/recipes/feed/")
+
+    def test_subscriptions(self):
+        self.assert_same_for_page_sizes(
+            "/api/users/subscriptions/", {"recipes_limit": 2}
+        )
+
+    def test_recipe_detail(self):
+        # у первого рецепта один тэг и два ингредиента, у последнего -
+        # два тэга и четыре ингредиента
+        counts = [
+            self.count_queries(f"/api/recipes/{recipe.id}/")
+            for recipe in [self.recipes[0], self.recipes[-1]]
+        ]
+        self.assertEqual(counts[0], counts[1])
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTests(QueryTestCase):
+    # при превышении бюджета из QUERY_BUDGETS запрос падает с
+    # QueryBudgetExceeded; проверяется страница без кэша, где запросов
+    # больше всего
+    cases = [
+        ("recipes-list", "/api/recipes/", {}),
+        ("recipes-feed", "/api/recipes/feed/", {}),
+        (
+            "users-subscriptions",
+            "/api/users/subscriptions/",
+            {"recipes_limit": 2},
+        ),
+    ]
+
+    def test_pages_fit_budgets(self):
+        for action, path, params in self.cases:
+            self.assertIn(action, settings.QUERY_BUDGETS)
+            for limit in [2, 6]:
+                with self.subTest(action=action, limit=limit):
+                    cache.clear()
+                    self.count_queries(path, dict(params, limit=limit))
+
+    def test_recipe_detail_fits_budget(self):
+        self.assertIn("recipes-detail", settings.QUERY_BUDGETS)
+        for recipe in [self.recipes[0], self.recipes[-1]]:
+            self.count_queries(f"/api/recipes/{recipe.id}/")
+
+    def test_exceeded_budget_raises(self):
+        with override_settings(QUERY_BUDGETS={"recipes-list": 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/recipes/")
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.test import TestCase
+
+from django_units.models import (
+    CustomUser,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+)
+
+
+class RecipeIngredientReceiverTests(TestCase):
+    def setUp(self):
+        author = CustomUser.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.recipe = Recipe.objects.create(
+            author=author,
+            name="Рецепт",
+            text="Описание",
+            image="recipes/images/test.png",
+            # варианты изображения считаются созданными
+            image_variants={"source": "recipes/images/test.png"},
+            cooking_time=10,
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit="г")
+            for name in ["сахар", "мука", "соль"]
+        ]
+
+    def test_modified_is_updated_once_per_transaction(self):
+        modified = self.recipe.modified
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for ingredient in self.ingredients:
+                    RecipeIngredient.objects.create(
+                        recipe=self.recipe, ingredient=ingredient, amount=1
+                    )
+        self.assertEqual(len(callbacks), 1)
+        with self.assertNumQueries(1):
+            callbacks[0]()
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.modified, modified)
+
+    def test_rows_after_commit_get_a_new_callback(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.ingredients[0], amount=1
+            )
+        with self.captureOnCommitCallbacks() as next_callbacks:
+            RecipeIngredient.objects.filter(recipe=self.recipe).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len(next_callbacks), 1)
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from django_units.models import (
+    CustomUser,
+    DataVersion,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+)
+
+
+# изменения другого процесса не доходят до его LocMemCache, поэтому
+# здесь они делаются запросами к БД без сигналов
+class RecipeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = CustomUser.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.recipe = Recipe.objects.create(
+            author=author,
+            name="Рецепт",
+            text="Описание",
+            image="recipes/images/test.png",
+            # варианты изображения считаются созданными
+            image_variants={"source": "recipes/images/test.png"},
+            cooking_time=10,
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="сахар", measurement_unit="г"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.ingredient, amount=100
+            )
+        self.client = APIClient()
+        self.url = f"/api/recipes/{self.recipe.id}/"
+
+    def test_recipe_change_is_seen_without_invalidation(self):
+        self.assertEqual(self.client.get(self.url).data["name"], "Рецепт")
+        Recipe.objects.filter(id=self.recipe.id).update(
+            name="Новый рецепт", modified=timezone.now()
+        )
+        self.assertEqual(
+            self.client.get(self.url).data["name"], "Новый рецепт"
+        )
+
+    def test_catalog_change_is_seen_without_invalidation(self):
+        self.client.get("/api/recipes/")
+        Ingredient.objects.filter(id=self.ingredient.id).update(name="соль")
+        DataVersion.objects.filter(name="ingredients").update(
+            version=1000
+        )
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(
+            response.data["results"][0]["ingredients"][0]["name"], "соль"
+        )
+
+    def test_ingredient_rows_change_is_seen(self):
+        self.client.get(self.url)
+        RecipeIngredient.objects.filter(recipe=self.recipe).update(amount=5)
+        # строки, сохраненные по одной, обновляют время изменения рецепта
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.get(recipe=self.recipe).save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["ingredients"][0]["amount"], 5)
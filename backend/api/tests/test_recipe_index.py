@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.recipe_index import RecipeIngredientIndex
+from django_units.models import (
+    CustomUser,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+)
+
+
+class RecipeIngredientIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = CustomUser.objects.create_user(
+            email="author@example.com",
+            username="author",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        # обработчики после фиксации выполняются, чтобы тесты видели
+        # только свои изменения
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                author=author,
+                name="Рецепт",
+                text="Описание",
+                image="recipes/images/test.png",
+                # варианты изображения считаются созданными
+                image_variants={"source": "recipes/images/test.png"},
+                cooking_time=10,
+            )
+            self.sugar, self.flour = [
+                Ingredient.objects.create(name=name, measurement_unit="г")
+                for name in ["сахар", "мука"]
+            ]
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=self.sugar, amount=1
+            )
+        self.index = RecipeIngredientIndex()
+
+    def test_update_publishes_a_new_index(self):
+        index = self.index.ensure_built()
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.flour, amount=1
+        )
+        self.index.update([self.recipe.id])
+        # индекс, полученный поиском до обновления, не изменился
+        self.assertEqual(index[0], {self.sugar.id: {self.recipe.id}})
+        self.assertEqual(
+            self.index.search([self.sugar.id]), [(self.recipe.id, 1, 1)]
+        )
+        self.assertEqual(
+            self.index.search([self.sugar.id, self.flour.id]),
+            [(self.recipe.id, 2, 0)],
+        )
+
+    def test_update_removes_deleted_recipe(self):
+        self.index.ensure_built()
+        recipe_id = self.recipe.id
+        self.recipe.delete()
+        self.index.update([recipe_id])
+        self.assertEqual(self.index.search([self.sugar.id]), [])
+
+    def test_ingredient_rows_update_index_once_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for ingredient in [self.flour, self.sugar]:
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipe, ingredient=ingredient
+                ).delete()
+                RecipeIngredient.objects.create(
+                    recipe=self.recipe, ingredient=ingredient, amount=2
+                )
+        # обновление индекса и времени изменения рецепта
+        self.assertEqual(len(callbacks), 2)
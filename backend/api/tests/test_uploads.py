@@ -0,0 +1,37 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from django_units.models import CustomUser, Recipe
+
+
+class UploadLimitTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(
+            email="user@example.com",
+            username="user",
+            first_name="Имя",
+            last_name="Фамилия",
+            password="password-123",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_rejects_request(self):
+        response = self.client.post(
+            "/api/recipes/",
+            {
+                "name": "Рецепт",
+                "text": "Описание",
+                "cooking_time": 10,
+                "image": SimpleUploadedFile(
+                    "image.png", b"\x89PNG" + b"0" * 1000, "image/png"
+                ),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("100 байт", response.data["detail"])
+        self.assertFalse(Recipe.objects.exists())
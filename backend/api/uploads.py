@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    # файл пишется во временный файл по мере приема; после превышения
+    # RECIPE_IMAGE_MAX_BYTES разбор запроса прерывается, и запрос
+    # отклоняется с ответом 400, а не обрабатывается с обрезанным файлом
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_BYTES:
+            raise MultiPartParserError(
+                f"Размер файла больше {settings.RECIPE_IMAGE_MAX_BYTES} байт."
+            )
+        return super().receive_data_chunk(raw_data, start)
@@ -1,25 +1,52 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import F, Sum
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+)
 
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+)
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
 from django_units.models import (
     Recipe,
     Tag,
     Ingredient,
     RecipeIngredient,
+    RecipeScore,
     FavoriteRecipe,
     Subscriber,
     ShoppingCart,
 )
 
-from api.renderers import DownloadRenderer
+from api.conditional import (
+    catalog_validators,
+    conditional,
+    recipe_validators,
+)
+from api.instrumentation import metrics_store
+from api.ingredient_index import ingredient_index
+from api.recipe_cache import get_recipes_data, get_recipes_data_by_id
+from api.recipe_index import recipe_ingredient_index
+from api.renderers import FastJSONRenderer, get_download_renderers
 from api.permissions import IsAuthor
-from api.pagination import PageLimitPagination
+from api.pagination import KeysetPagination, PageLimitPagination
 from api.serializers import (
     UserSerializer,
     UserCreateRequestSerializer,
@@ -30,7 +57,6 @@ from api.serializers import (
     RecipeSerializer,
     RecipeCreateRequestSerializer,
     RecipeShortSerializer,
-    DownloadSerializer,
     SubscriberSerializer,
 )
 
@@ -40,6 +66,7 @@ User = get_user_model()
 
 class UserViewSet(viewsets.ModelViewSet):
     pagination_class = PageLimitPagination
+    cursor_ordering = ["id"]
     http_method_names = ["get", "post"]
     queryset = User.objects.all()
 
@@ -97,9 +124,35 @@ class UserViewSet(viewsets.ModelViewSet):
         author_ids = Subscriber.objects.filter(user=request.user).values(
             "author__id"
         )
-        queryset = User.objects.filter(id__in=author_ids)
+        # рецепты авторов страницы подгружаются одним запросом,
+        # recipes_limit применяется к каждому автору коррелированным
+        # подзапросом
+        recipes = Recipe.objects.only(
+            "id",
+            "name",
+            "image",
+            "image_variants",
+            "cooking_time",
+            "author_id",
+        )
+        recipes_limit = request.GET.get("recipes_limit")
+        if recipes_limit:
+            limited_ids = Recipe.objects.filter(
+                author=OuterRef("author")
+            ).values("id")[: int(recipes_limit)]
+            recipes = recipes.filter(id__in=Subquery(limited_ids))
+        queryset = (
+            User.objects.filter(id__in=author_ids)
+            .annotate(is_subscribed=Value(True))
+            .prefetch_related(
+                Prefetch("recipe_set", queryset=recipes, to_attr="recipes")
+            )
+            .order_by("id")
+        )
         paginator = self.pagination_class()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
+        paginated_queryset = paginator.paginate_queryset(
+            queryset, request, view=self
+        )
         serializer = self.get_serializer(
             paginated_queryset,
             context={"request": request},
@@ -112,8 +165,28 @@ class IngredientViewSet(viewsets.ModelViewSet):
     http_method_names = ["get"]
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ("^name",)
+
+    @conditional(catalog_validators("ingredients"))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional(catalog_validators("ingredients"))
+    def list(self, request):
+        # поиск по началу названия обслуживается индексом в памяти
+        name = request.GET.get(api_settings.SEARCH_PARAM)
+        if not name:
+            return super().list(request)
+        limit = request.GET.get("limit", settings.INGREDIENT_SEARCH_LIMIT)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {"errors": "limit должен быть положительным целым числом"}
+            )
+        limit = min(limit, settings.INGREDIENT_SEARCH_MAX_LIMIT)
+        return Response(ingredient_index.search(name, limit))
 
 
 class TagViewSet(viewsets.ModelViewSet):
@@ -121,6 +194,14 @@ class TagViewSet(viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
+    @conditional(catalog_validators("tags"))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(catalog_validators("tags"))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = PageLimitPagination
@@ -131,10 +212,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
         context.update({"request": self.request})
         return context
 
+    def get_score_ordering(self):
+        ordering = self.request.GET.get("ordering")
+        return ordering if ordering in RecipeScore.SCORES else None
+
+    @property
+    def cursor_ordering(self):
+        if self.get_score_ordering():
+            return ["-score_value", "-id"]
+        return ["-pub_date", "-id"]
+
     def get_queryset(self):
         queryset = Recipe.objects.all()
         if self.action != "list":
             return queryset
+        # полнотекстовый поиск; порядок по релевантности действует при
+        # постраничном выводе по номеру страницы
+        search = self.request.GET.get("search")
+        if search:
+            queryset = queryset.search(search)
+        # сортировка по заранее рассчитанной популярности
+        score = self.get_score_ordering()
+        if score:
+            queryset = queryset.order_by_score(score)
         # фильтрация по is_favorited
         if self.request.GET.get("is_favorited") == "1":
             favorite_recipes_ids = FavoriteRecipe.objects.filter(
@@ -162,6 +262,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action in [
             "create",
             "download_shopping_cart",
+            "feed",
         ]:
             return [IsAuthenticated()]
         if self.action in ["destroy", "partial_update"]:
@@ -169,8 +270,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return [AllowAny()]
 
     def get_serializer_class(self):
-        if self.action == "download_shopping_cart":
-            return DownloadSerializer
         if self.request.method in ["POST", "PATCH"]:
             return RecipeCreateRequestSerializer
         return RecipeSerializer
@@ -180,31 +279,133 @@ class RecipeViewSet(viewsets.ModelViewSet):
             self.action == "download_shopping_cart"
             and self.request.user.is_authenticated
         ):
-            return [DownloadRenderer()]
+            return get_download_renderers()
         return super().get_renderers()
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        # выгрузка отдается потоком, а ответы с ошибками (например, 406
+        # при неподходящем Accept) - словари, поэтому они выводятся в JSON
+        if self.action == "download_shopping_cart" and isinstance(
+            response, Response
+        ):
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = FastJSONRenderer.media_type
+        return response
+
+    def get_sparse_fields(self, request):
+        # ?fields=id,name,image&expand=author - только нужные поля,
+        # вложенные объекты без expand выводятся по id
+        fields = request.GET.get("fields")
+        if not fields:
+            return None, None
+        fields = fields.split(",")
+        expand = request.GET.get("expand")
+        expand = expand.split(",") if expand else []
+        unknown = set(fields) - set(RecipeSerializer.Meta.fields)
+        unknown |= set(expand) - set(RecipeSerializer.COMPACT_FIELDS)
+        if unknown:
+            raise ValidationError(
+                {"errors": f"Неизвестные поля: {', '.join(sorted(unknown))}"}
+            )
+        return fields, expand
+
+    def list(self, request):
+        fields, expand = self.get_sparse_fields(request)
+        # из страницы нужны только id, поля сортировки и время изменения
+        # для ключа кэша, представления рецептов собираются отдельно
+        queryset = self.filter_queryset(self.get_queryset()).only(
+            "id", "pub_date", "modified"
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                get_recipes_data(page, request, fields, expand)
+            )
+        return Response(get_recipes_data(queryset, request, fields, expand))
+
+    @conditional(recipe_validators)
+    def retrieve(self, request, pk=None):
+        recipe = self.get_object()
+        return Response(get_recipes_data([recipe], request)[0])
+
+    @action(methods=["get"], detail=False)
+    def feed(self, request):
+        # рецепты авторов из подписок одной лентой по времени публикации;
+        # подписки подставляются подзапросом, а страницы выбираются по
+        # ключу (pub_date, id), поэтому число авторов и глубина ленты не
+        # влияют на стоимость страницы
+        author_ids = Subscriber.objects.filter(user=request.user).values(
+            "author_id"
+        )
+        queryset = Recipe.objects.filter(author__in=author_ids)
+        paginator = KeysetPagination(
+            ["-pub_date", "-id"], self.paginator.get_page_size(request)
+        )
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(
+            get_recipes_data(page, request)
+        )
+
+    @action(methods=["get"], detail=False)
+    def by_ingredients(self, request):
+        # рецепты из имеющихся ингредиентов по обратному индексу: сначала
+        # те, для которых есть все ингредиенты, затем с наименьшим
+        # числом недостающих
+        try:
+            ingredient_ids = [
+                int(ingredient_id)
+                for ingredient_id in request.GET.getlist("ingredients")
+            ]
+            max_missing = request.GET.get("max_missing")
+            max_missing = int(max_missing) if max_missing else None
+        except ValueError:
+            return Response(
+                {"errors": "Ошибка - ингредиенты задаются числовыми id"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ingredient_ids or (
+            len(ingredient_ids) > settings.RECIPE_INGREDIENT_SEARCH_MAX
+        ):
+            return Response(
+                {
+                    "errors": "Ошибка - нужно указать от 1 до "
+                    f"{settings.RECIPE_INGREDIENT_SEARCH_MAX} ингредиентов"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        matches = recipe_ingredient_index.search(ingredient_ids, max_missing)
+        # результат поиска - список, поэтому выводится по номеру страницы
+        page = self.paginator.paginate_queryset(matches, request)
+        counts = {
+            recipe_id: (matched, missing)
+            for recipe_id, matched, missing in page
+        }
+        data = get_recipes_data_by_id(list(counts), request)
+        for item in data:
+            matched, missing = counts[item["id"]]
+            item["matched_ingredients"] = matched
+            item["missing_ingredients"] = missing
+        return self.paginator.get_paginated_response(data)
+
     def create(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         # извлекаем ингредиенты
         ingredients = serializer.validated_data.pop("ingredients")
         ingredient_ids = [ingredient["id"] for ingredient in ingredients]
-        # создаем новый рецепт
-        new_recipe = serializer.save(
-            ingredients=ingredient_ids, author=request.user
-        )
-        # заполняем связанную таблицу
-        for ingredient in ingredients:
-            ingredient_id = ingredient["id"]
-            ingredient_amount = ingredient["amount"]
-            RecipeIngredient.objects.create(
-                recipe=new_recipe,
-                ingredient=Ingredient.objects.get(id=ingredient_id),
-                amount=ingredient_amount,
+        with transaction.atomic():
+            # создаем новый рецепт
+            new_recipe = serializer.save(
+                ingredients=ingredient_ids, author=request.user
             )
+            # заполняем связанную таблицу
+            self.save_recipe_ingredients(new_recipe, ingredients)
         # возвращаем новый рецепт
         return Response(
-            RecipeSerializer(new_recipe, context={"request": request}).data,
+            self.get_recipe_data(new_recipe),
             status=status.HTTP_201_CREATED,
         )
 
@@ -218,49 +419,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # извлекаем ингредиенты
         ingredients = serializer.validated_data.pop("ingredients")
         ingredient_ids = [ingredient["id"] for ingredient in ingredients]
-        # обновляем рецепт
-        serializer.save(ingredients=ingredient_ids)
-        # удаляем старые данные из связанной таблицы
-        RecipeIngredient.objects.filter(recipe=updated_recipe).delete()
-        # заполняем связанную таблицу новыми данными
-        for ingredient in ingredients:
-            ingredient_id = ingredient["id"]
-            ingredient_amount = ingredient["amount"]
-            RecipeIngredient.objects.create(
-                recipe=updated_recipe,
-                ingredient=Ingredient.objects.get(id=ingredient_id),
-                amount=ingredient_amount,
-            )
+        with transaction.atomic():
+            # обновляем рецепт
+            serializer.save(ingredients=ingredient_ids)
+            # обновляем связанную таблицу
+            self.save_recipe_ingredients(updated_recipe, ingredients)
         # возвращаем новый рецепт
         return Response(
-            RecipeSerializer(
-                updated_recipe, context={"request": request}
-            ).data,
+            self.get_recipe_data(updated_recipe),
             status=status.HTTP_200_OK,
         )
 
+    def save_recipe_ingredients(self, recipe, ingredients):
+        # сравниваем с уже сохраненными строками: новые добавляем,
+        # изменившиеся обновляем, лишние удаляем - каждое одним запросом
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        to_create = []
+        to_update = []
+        for ingredient in ingredients:
+            ingredient_object = ingredient["ingredient"]
+            recipe_ingredient = existing.pop(ingredient_object.id, None)
+            if recipe_ingredient is None:
+                to_create.append(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=ingredient_object,
+                        amount=ingredient["amount"],
+                    )
+                )
+            elif recipe_ingredient.amount != int(ingredient["amount"]):
+                recipe_ingredient.amount = ingredient["amount"]
+                to_update.append(recipe_ingredient)
+        if existing:
+            RecipeIngredient.objects.filter(
+                id__in=[item.id for item in existing.values()]
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ["amount"])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+
+    def get_recipe_data(self, recipe):
+        return get_recipes_data([recipe], self.request)[0]
+
     @action(methods=["get"], detail=False)
-    def download_shopping_cart(self, request):
+    def download_shopping_cart(self, request, format=None):
         recipes = ShoppingCart.objects.filter(user=request.user).values(
             "recipe"
         )
         queryset = (
             RecipeIngredient.objects.filter(recipe__in=recipes)
-            .select_related("ingredient")
-            .values("ingredient__name")
+            .values("ingredient__name", "ingredient__measurement_unit")
             .annotate(total_amount=Sum("amount"))
             .annotate(measurement_unit=F("ingredient__measurement_unit"))
             .annotate(ingredient_name=F("ingredient__name"))
+            .values("ingredient_name", "total_amount", "measurement_unit")
+            .order_by("ingredient_name")
         )
-        serializer = self.get_serializer(queryset, many=True)
-        file_name = "shopping_cart.txt"
-        return Response(
-            serializer.data,
-            headers={
-                "Content-Disposition": f'attachment; filename="{file_name}"'
-            },
+        # формат выбран согласованием контента (суффикс или Accept),
+        # строки читаются серверным курсором и сразу отдаются клиенту
+        renderer = request.accepted_renderer
+        rows = queryset.iterator(chunk_size=settings.SHOPPING_CART_CHUNK_SIZE)
+        file_name = f"shopping_cart.{renderer.format}"
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            renderer.stream(rows),
+            content_type=content_type,
             status=status.HTTP_200_OK,
         )
+        response[
+            "Content-Disposition"
+        ] = f'attachment; filename="{file_name}"'
+        return response
 
 
 class FavoriteViewSet(viewsets.ModelViewSet):
@@ -269,14 +506,16 @@ class FavoriteViewSet(viewsets.ModelViewSet):
 
     def create(self, request, recipe_id):
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        if FavoriteRecipe.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
+        # повторное добавление отсекает уникальное ограничение
+        # (user, recipe), без предварительной проверки
+        try:
+            with transaction.atomic():
+                FavoriteRecipe.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
             return Response(
                 {"errors": "Ошибка добавления - рецепт уже в избранном"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        FavoriteRecipe.objects.create(user=request.user, recipe=recipe)
         return Response(
             RecipeShortSerializer(recipe).data,
             status=status.HTTP_201_CREATED,
@@ -285,14 +524,15 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     @action(methods=["delete"], detail=False)
     def delete(self, request, recipe_id):
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not FavoriteRecipe.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
+        with transaction.atomic():
+            deleted, _ = FavoriteRecipe.objects.filter(
+                user=request.user, recipe=recipe
+            ).delete()
+        if not deleted:
             return Response(
                 {"errors": "Ошибка удаления - рецепта нет в избранном"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        FavoriteRecipe.objects.get(user=request.user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -302,14 +542,16 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
 
     def create(self, request, recipe_id):
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        if ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
+        # повторное добавление отсекает уникальное ограничение
+        # (user, recipe), без предварительной проверки
+        try:
+            with transaction.atomic():
+                ShoppingCart.objects.create(user=request.user, recipe=recipe)
+        except IntegrityError:
             return Response(
                 {"errors": "Ошибка добавления - рецепт уже в списке покупок"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        ShoppingCart.objects.create(user=request.user, recipe=recipe)
         return Response(
             RecipeShortSerializer(recipe).data,
             status=status.HTTP_201_CREATED,
@@ -318,14 +560,15 @@ class ShoppingCartViewSet(viewsets.ModelViewSet):
     @action(methods=["delete"], detail=False)
     def delete(self, request, recipe_id):
         recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
+        with transaction.atomic():
+            deleted, _ = ShoppingCart.objects.filter(
+                user=request.user, recipe=recipe
+            ).delete()
+        if not deleted:
             return Response(
                 {"errors": "Ошибка удаления - рецепта нет в списке покупок"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        ShoppingCart.objects.get(user=request.user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -367,3 +610,14 @@ class SubscriberViewSet(viewsets.ModelViewSet):
         return Response(
             status=status.HTTP_204_NO_CONTENT,
         )
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics_store.snapshot(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        metrics_store.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,12 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# обработчик с чтением потоковых ответов вне цикла событий
+from api.offload import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
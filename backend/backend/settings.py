@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.instrumentation.InstrumentationMiddleware",
+    "api.db_router.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -38,6 +40,26 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# sync - gunicorn с синхронными воркерами (backend.wsgi), async - ASGI
+# (backend.asgi) с выполнением представлений чтения в пуле потоков;
+# режим выбирается при запуске в scripts.sh
+SERVER_MODE = os.getenv("SERVER_MODE", "sync")
+
+ASYNC_VIEWS = [
+    "recipes-list",
+    "recipes-detail",
+    "recipes-feed",
+    "recipes-download-shopping-cart",
+    "tag-list",
+    "tag-detail",
+    "ingredient-list",
+    "ingredient-detail",
+    "users-subscriptions",
+]
+
+# число потоков на процесс, а значит и соединений с БД
+ASYNC_VIEW_THREADS = int(os.getenv("ASYNC_VIEW_THREADS", 16))
+
 ROOT_URLCONF = "backend.urls"
 
 TEMPLATES = [
@@ -66,6 +88,43 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "foodgram"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", 5432),
+        # постоянные соединения: время жизни в секундах, 0 - соединение
+        # на каждый запрос
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # PgBouncer в режиме transaction не поддерживает серверные
+        # курсоры (iterator() выгрузки списка покупок)
+        "DISABLE_SERVER_SIDE_CURSORS": os.getenv("DB_PGBOUNCER", "False")
+        == "True",
+    }
+}
+
+# реплики для чтения: host[:port] через запятую; остальные параметры
+# подключения те же, что у основной БД
+for index, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(","))
+):
+    host, _, port = replica.strip().partition(":")
+    DATABASES[f"replica_{index}"] = dict(
+        DATABASES["default"],
+        HOST=host,
+        PORT=port or DATABASES["default"]["PORT"],
+        TEST={"MIRROR": "default"},
+    )
+
+DATABASE_ROUTERS = ["api.db_router.ReplicaRouter"]
+
+# сколько секунд после записи чтения клиента идут на основную БД
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+# проверка постоянного соединения перед запросом
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True"
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
     }
 }
 
@@ -105,8 +164,95 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.TokenAuthentication",
     ),
     "SEARCH_PARAM": "name",
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 AUTH_USER_MODEL = "django_units.CustomUser"
 
 DEFAULT_PAGINATION_PAGE_SIZE = 2
+
+SHOPPING_CART_CHUNK_SIZE = 500
+
+SHOPPING_CART_PDF_SPOOL_SIZE = 1024 * 1024
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    "SHOPPING_CART_PDF_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv("INGREDIENT_SEARCH_LIMIT", 50))
+
+INGREDIENT_SEARCH_MAX_LIMIT = 500
+
+INGREDIENT_INDEX_MAX_AGE = int(os.getenv("INGREDIENT_INDEX_MAX_AGE", 60))
+
+RECIPE_INDEX_MAX_AGE = int(os.getenv("RECIPE_INDEX_MAX_AGE", 10 * 60))
+
+RECIPE_INGREDIENT_SEARCH_MAX = 50
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", 60 * 60))
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "True") == "True"
+
+# допустимое число запросов к БД на действие представления; при
+# превышении пишется предупреждение, а с QUERY_BUDGET_RAISE=True
+# поднимается исключение (удобно в тестах и бенчмарках)
+QUERY_BUDGETS = {
+    "recipes-list": 8,
+    "recipes-detail": 9,
+    "recipes-by-ingredients": 8,
+    "recipes-feed": 7,
+    "users-subscriptions": 6,
+    "tag-list": 3,
+    "ingredient-list": 3,
+}
+
+QUERY_BUDGET_RAISE = os.getenv("QUERY_BUDGET_RAISE", "False") == "True"
+
+# наибольшая сторона оригинала и вариантов изображения рецепта, пиксели
+RECIPE_IMAGE_MAX_SIZE = 2048
+
+RECIPE_IMAGE_VARIANTS = {
+    "thumbnail": 480,
+    "detail": 1280,
+}
+
+RECIPE_IMAGE_QUALITY = 80
+
+# multipart-загрузки сразу пишутся во временный файл
+FILE_UPLOAD_HANDLERS = ["api.uploads.LimitedTemporaryFileUploadHandler"]
+
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+
+# файлы изображений моложе этого возраста (секунды) не удаляются
+# командой cleanup_images
+IMAGE_CLEANUP_MIN_AGE = 60 * 60
+
+# конфигурация полнотекстового поиска PostgreSQL (стемминг); ей же
+# заполняются векторы в миграции и при сохранении рецепта, поэтому
+# после смены векторы пересчитывают Recipe.objects.update_search_vector()
+RECIPE_SEARCH_CONFIG = os.getenv("RECIPE_SEARCH_CONFIG", "russian")
+
+# веса избранного и корзины в оценках популярности рецепта
+RECIPE_SCORE_WEIGHTS = {
+    "favorites": 1.0,
+    "carts": 0.5,
+}
+
+# период полураспада вклада добавления в trending-оценку (секунды);
+# учитываются добавления не старше RECIPE_TRENDING_WINDOW периодов
+RECIPE_TRENDING_HALF_LIFE = int(
+    os.getenv("RECIPE_TRENDING_HALF_LIFE", 3 * 24 * 60 * 60)
+)
+
+RECIPE_TRENDING_WINDOW = 5
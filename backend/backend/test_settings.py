@@ -0,0 +1,11 @@
+from backend.settings import *  # noqa: F401,F403
+from backend.settings import DATABASES
+
+
+# тесты маршрутизации читают с отдельной тестовой БД-реплики на
+# сервере основной: настоящие реплики доступны только для чтения и в
+# тестах заменяются основной БД
+DATABASES["test_replica"] = dict(
+    DATABASES["default"],
+    TEST={"NAME": f"test_{DATABASES['default']['NAME']}_replica"},
+)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
@@ -11,7 +12,9 @@ from api.views import (
     FavoriteViewSet,
     ShoppingCartViewSet,
     SubscriberViewSet,
+    MetricsView,
 )
+from api.offload import offload_urls
 
 
 router = DefaultRouter()
@@ -35,8 +38,13 @@ router.register(
 )
 router.register("recipes", RecipeViewSet, basename="recipes")
 
+api_urls = router.urls
+if settings.SERVER_MODE == "async":
+    api_urls = offload_urls(api_urls, settings.ASYNC_VIEWS)
+
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/", include(router.urls)),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
+    path("api/", include(api_urls)),
     path("api/auth/", include("djoser.urls.authtoken")),
 ]
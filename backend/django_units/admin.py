@@ -36,6 +36,16 @@ class RecipeAdmin(admin.ModelAdmin):
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ["id", "recipe", "ingredient", "amount"]
 
+    # сигнал строки, перенесенной в другой рецепт, знает только новый
+    # рецепт, поэтому прежний сохраняется явно: так обновляются его
+    # время изменения и индекс по ингредиентам
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        old_recipe_id = form.initial.get("recipe")
+        if change and old_recipe_id != obj.recipe_id:
+            for recipe in Recipe.objects.filter(id=old_recipe_id):
+                recipe.save(update_fields=["modified"])
+
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
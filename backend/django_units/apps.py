@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DjangoUnitsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_units"
+
+    def ready(self):
+        import django_units.receivers  # noqa: F401
@@ -0,0 +1,61 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from django_units.models import (
+    CustomUser,
+    FavoriteRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscriber,
+)
+
+
+# (модель со счетчиком, поле счетчика, считаемая модель, ее внешний ключ)
+COUNTERS = [
+    (Recipe, "favorites_count", FavoriteRecipe, "recipe"),
+    (Recipe, "in_carts_count", ShoppingCart, "recipe"),
+    (CustomUser, "recipes_count", Recipe, "author"),
+    (CustomUser, "followers_count", Subscriber, "author"),
+]
+
+
+def change_counters(sender, instance, delta):
+    # атомарное изменение счетчиков в БД выражением F, без чтения;
+    # разошедшийся счетчик не уходит ниже нуля (поле положительное),
+    # его исправит reconcile_counters
+    for model, field, counted_model, foreign_key in COUNTERS:
+        if counted_model is sender:
+            model.objects.filter(
+                pk=getattr(instance, f"{foreign_key}_id")
+            ).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_expression(counted_model, foreign_key):
+    # фактическое число связанных строк для каждой строки модели
+    return Coalesce(
+        Subquery(
+            counted_model.objects.filter(**{foreign_key: OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+def reconcile_counters(dry_run=False):
+    # пересчитывает разошедшиеся счетчики; возвращает
+    # {"Модель.поле": число исправленных строк}
+    result = {}
+    for model, field, counted_model, foreign_key in COUNTERS:
+        drifted = model.objects.annotate(
+            actual=count_expression(counted_model, foreign_key)
+        ).exclude(**{field: F("actual")})
+        ids = list(drifted.values_list("pk", flat=True))
+        if ids and not dry_run:
+            model.objects.filter(pk__in=ids).update(
+                **{field: count_expression(counted_model, foreign_key)}
+            )
+        result[f"{model.__name__}.{field}"] = len(ids)
+    return result
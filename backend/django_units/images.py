@@ -0,0 +1,153 @@
+import hashlib
+import io
+import os
+from collections import Counter
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+VARIANTS_DIR = "recipes/variants"
+# формат Pillow и расширение файла для каждого формата вариантов
+FORMATS = {
+    "webp": ("WEBP", "webp"),
+    "jpeg": ("JPEG", "jpg"),
+}
+
+
+def open_image(file):
+    image = Image.open(file)
+    # учитываем поворот из EXIF до того, как метаданные будут отброшены
+    return ImageOps.exif_transpose(image)
+
+
+def encode(image, image_format):
+    # сохранение без exif/icc - метаданные не переносятся
+    if image_format in ["JPEG", "WEBP"] and image.mode not in ["RGB", "L"]:
+        background = Image.new("RGB", image.size, "white")
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.RECIPE_IMAGE_QUALITY,
+        optimize=image_format == "JPEG",
+    )
+    return buffer.getvalue()
+
+
+# метаданные, которые не должны попадать в сохраненные изображения
+METADATA_KEYS = {"exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment"}
+
+
+def prepare_original(field_file):
+    # ограничивает размеры нового (еще не сохраненного) изображения
+    # и удаляет из него метаданные; уже подготовленное изображение не
+    # перекодируется, поэтому повторная загрузка дает тот же файл
+    field_file.seek(0)
+    image = Image.open(field_file)
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+    if image.format not in ["JPEG", "PNG", "WEBP"] or (
+        max(image.size) <= max_size and not METADATA_KEYS & set(image.info)
+    ):
+        field_file.seek(0)
+        return
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size))
+    name = field_file.name
+    field_file.file = ContentFile(encode(image, image_format), name=name)
+
+
+def content_name(field_file):
+    # имя файла по хэшу содержимого: одинаковые изображения получают
+    # одно имя и хранятся один раз
+    digest = hashlib.sha256()
+    field_file.seek(0)
+    for chunk in field_file.file.chunks():
+        digest.update(chunk)
+    field_file.seek(0)
+    extension = os.path.splitext(field_file.name)[1].lower()
+    return f"{digest.hexdigest()}{extension}"
+
+
+def touch(name, storage=default_storage):
+    # повторно используемый файл получает новое время изменения, чтобы
+    # cleanup_images не удалил его как старый и ничейный; возвращает
+    # False, если файла нет
+    try:
+        os.utime(storage.path(name))
+    except NotImplementedError:
+        return storage.exists(name)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def variant_name(source_name, variant, extension):
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return f"{VARIANTS_DIR}/{stem}_{variant}.{extension}"
+
+
+def create_variants(field_file, overwrite=False):
+    # уменьшенные копии для списка и карточки рецепта в WebP и JPEG;
+    # возвращает {"source": имя оригинала, вариант: {формат: имя файла}};
+    # варианты уже сохраненного оригинала используются повторно
+    names = {
+        variant: {
+            key: variant_name(field_file.name, variant, extension)
+            for key, (image_format, extension) in FORMATS.items()
+        }
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    }
+    variants = dict(names, source=field_file.name)
+    if not overwrite and all(
+        touch(name) for formats in names.values() for name in formats.values()
+    ):
+        return variants
+    with field_file.open("rb") as f:
+        source = open_image(f)
+        source.load()
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        image = source.copy()
+        image.thumbnail((size, size))
+        for key, (image_format, extension) in FORMATS.items():
+            name = names[variant][key]
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(
+                name, ContentFile(encode(image, image_format))
+            )
+    return variants
+
+
+def get_referenced_files(recipes):
+    # число ссылок рецептов на каждый файл оригинала и вариантов
+    references = Counter()
+    for image, variants in recipes.values_list("image", "image_variants"):
+        if image:
+            references[image] += 1
+        for variant in settings.RECIPE_IMAGE_VARIANTS:
+            for name in (variants or {}).get(variant, {}).values():
+                references[name] += 1
+    return references
+
+
+def get_variant_urls(recipe, build_url):
+    # пока варианты не созданы, отдаем ссылку на оригинал
+    variants = recipe.image_variants or {}
+    original_url = build_url(recipe.image.url) if recipe.image else None
+    return {
+        variant: {
+            key: build_url(default_storage.url(variants[variant][key]))
+            if variant in variants
+            else original_url
+            for key in FORMATS
+        }
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    }
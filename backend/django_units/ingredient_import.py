@@ -0,0 +1,125 @@
+import csv
+import json
+import time
+from dataclasses import dataclass
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from django_units.models import DataVersion, Ingredient
+
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+
+
+def read_csv(file):
+    # строки вида: название,единица измерения (без заголовка)
+    for row in csv.reader(file):
+        if len(row) < 2:
+            continue
+        yield {"name": row[0], "measurement_unit": row[1]}
+
+
+def read_json(file):
+    # список объектов {"id": ..., "name": ..., "measurement_unit": ...},
+    # id необязателен
+    for item in json.load(file):
+        yield {
+            "id": item.get("id"),
+            "name": item["name"],
+            "measurement_unit": item["measurement_unit"],
+        }
+
+
+READERS = {
+    "csv": read_csv,
+    "json": read_json,
+}
+
+
+def import_ingredients(records):
+    # записи с id сверяются по id, без id - по паре (название, единица),
+    # поэтому повторный импорт того же файла ничего не меняет
+    started = time.monotonic()
+    result = ImportResult()
+    by_id = {}
+    by_key = {}
+    for record in records:
+        name = record["name"].strip()
+        measurement_unit = record["measurement_unit"].strip()
+        if record.get("id"):
+            by_id[int(record["id"])] = (name, measurement_unit)
+        else:
+            by_key[(name, measurement_unit)] = None
+    with transaction.atomic():
+        existing_by_id = Ingredient.objects.in_bulk(list(by_id))
+        # строки, записанные до нормализации, сравниваются без
+        # пробельных символов по краям
+        existing_keys = {
+            (name.strip(), measurement_unit.strip())
+            for name, measurement_unit in Ingredient.objects.values_list(
+                "name", "measurement_unit"
+            )
+        }
+        to_create_with_id = []
+        to_create = []
+        to_update = []
+        for ingredient_id, (name, measurement_unit) in by_id.items():
+            ingredient = existing_by_id.get(ingredient_id)
+            if ingredient is None:
+                to_create_with_id.append(
+                    Ingredient(
+                        id=ingredient_id,
+                        name=name,
+                        measurement_unit=measurement_unit,
+                    )
+                )
+            elif (ingredient.name, ingredient.measurement_unit) != (
+                name,
+                measurement_unit,
+            ):
+                ingredient.name = name
+                ingredient.measurement_unit = measurement_unit
+                to_update.append(ingredient)
+            else:
+                result.unchanged += 1
+            existing_keys.add((name, measurement_unit))
+        for name, measurement_unit in by_key:
+            if (name, measurement_unit) in existing_keys:
+                result.unchanged += 1
+                continue
+            to_create.append(
+                Ingredient(name=name, measurement_unit=measurement_unit)
+            )
+            existing_keys.add((name, measurement_unit))
+        Ingredient.objects.bulk_create(
+            to_create_with_id, batch_size=BATCH_SIZE
+        )
+        # строки с явными id (из JSON и из прежнего импорта) не двигают
+        # последовательность PostgreSQL, и новая запись без id получила
+        # бы уже занятый ключ
+        if to_create_with_id or to_create:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Ingredient]
+                ):
+                    cursor.execute(sql)
+        Ingredient.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        Ingredient.objects.bulk_update(
+            to_update, ["name", "measurement_unit"], batch_size=BATCH_SIZE
+        )
+        # bulk-операции не отправляют сигналы, версию меняем сами
+        if to_create_with_id or to_create or to_update:
+            DataVersion.bump("ingredients")
+    result.inserted = len(to_create_with_id) + len(to_create)
+    result.updated = len(to_update)
+    result.seconds = time.monotonic() - started
+    return result
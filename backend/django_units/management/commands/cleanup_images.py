@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from django_units.images import VARIANTS_DIR, get_referenced_files
+from django_units.models import Recipe
+
+
+IMAGE_DIRS = [Recipe._meta.get_field("image").upload_to, VARIANTS_DIR]
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаление файлов изображений, на которые не ссылается "
+        "ни один рецепт"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=settings.IMAGE_CLEANUP_MIN_AGE,
+            help="Не трогать файлы моложе указанного числа секунд "
+            "(могут принадлежать еще не сохраненным рецептам)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        references = get_referenced_files(Recipe.objects.all())
+        threshold = timezone.now() - timedelta(seconds=options["min_age"])
+        candidates = []
+        kept = 0
+        for directory in IMAGE_DIRS:
+            if not default_storage.exists(directory):
+                continue
+            for file_name in default_storage.listdir(directory)[1]:
+                name = f"{directory}/{file_name}"
+                if references[name]:
+                    kept += 1
+                    continue
+                if default_storage.get_modified_time(name) > threshold:
+                    continue
+                candidates.append(name)
+        # пока шел обход, новый рецепт мог повторно использовать старый
+        # файл: такой файл получает ссылку и новое время изменения,
+        # поэтому перед удалением оба условия проверяются еще раз
+        references = get_referenced_files(Recipe.objects.all())
+        deleted = 0
+        for name in candidates:
+            if references[name] or (
+                default_storage.get_modified_time(name) > threshold
+            ):
+                kept += 1
+                continue
+            if not options["dry_run"]:
+                default_storage.delete(name)
+            deleted += 1
+            self.stdout.write(f"orphan: {name}", self.style.WARNING)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"CLEANUP IMAGES SUCCESS!!! referenced: {kept}, "
+                f"orphaned: {deleted}"
+            )
+        )
@@ -0,0 +1,220 @@
+import io
+import random
+from datetime import timedelta
+
+from PIL import Image
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from django_units.counters import reconcile_counters
+from django_units.models import (
+    CustomUser,
+    DataVersion,
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Subscriber,
+    Tag,
+)
+
+
+BATCH_SIZE = 2000
+IMAGE_NAME = "recipes/images/generated.png"
+TAGS = [
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+    ("Десерт", "#F7C242", "dessert"),
+    ("Выпечка", "#B0683B", "bakery"),
+]
+
+
+def bulk_create(model, objects):
+    # SQLite не возвращает id из bulk_create, поэтому новые строки
+    # перечитываются по возрастанию id
+    last_id = model.objects.aggregate(Max("id"))["id__max"] or 0
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    return list(model.objects.filter(id__gt=last_id).order_by("id"))
+
+
+def zipf_weights(count, exponent):
+    # небольшое число "популярных" объектов получает большую часть выборок
+    return [1 / (rank**exponent) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = "Генерация синтетических данных для бенчмарков"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--favorites", type=int, default=50000)
+        parser.add_argument("--carts", type=int, default=20000)
+        parser.add_argument("--subscriptions", type=int, default=20000)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Показатель распределения Ципфа для авторов и рецептов",
+        )
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        if not Ingredient.objects.exists():
+            call_command("import_ingredients", stdout=self.stdout)
+        with transaction.atomic():
+            tags = self.create_tags()
+            users = self.create_users(options["users"])
+            recipes = self.create_recipes(
+                users, tags, options["recipes"], options
+            )
+            self.create_pairs(
+                FavoriteRecipe, users, recipes, options["favorites"], options
+            )
+            self.create_pairs(
+                ShoppingCart, users, recipes, options["carts"], options
+            )
+            self.create_subscriptions(users, options["subscriptions"], options)
+            # массовая вставка идет без сигналов, счетчики пересчитываются
+            reconcile_counters()
+            for name in ["tags", "users"]:
+                DataVersion.bump(name)
+        call_command("update_recipe_scores", stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"GENERATE DATA SUCCESS!!! users: {len(users)}, "
+                f"recipes: {len(recipes)}"
+            )
+        )
+
+    def create_tags(self):
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={"name": name, "color": color}
+            )
+        return list(Tag.objects.all())
+
+    def create_users(self, count):
+        start = CustomUser.objects.count()
+        password = make_password("generated")
+        users = [
+            CustomUser(
+                email=f"user{number}@generated.foodgram",
+                username=f"user{number}",
+                first_name=f"Имя{number}",
+                last_name=f"Фамилия{number}",
+                password=password,
+            )
+            for number in range(start, start + count)
+        ]
+        return bulk_create(CustomUser, users)
+
+    def get_image(self):
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new("RGB", (64, 64), "orange").save(buffer, "PNG")
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, users, tags, count, options):
+        image = self.get_image()
+        authors = self.random.choices(
+            users, zipf_weights(len(users), options["skew"]), k=count
+        )
+        now = timezone.now()
+        recipes = [
+            Recipe(
+                author=author,
+                name=f"Рецепт {number}",
+                text=f"Описание приготовления рецепта {number}. " * 5,
+                image=image,
+                cooking_time=self.random.randint(5, 180),
+            )
+            for number, author in enumerate(authors)
+        ]
+        recipes = bulk_create(Recipe, recipes)
+        # auto_now_add ставит одинаковое время, разносим даты публикации
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.random.randint(0, options["days"] * 86400)
+            )
+        Recipe.objects.bulk_update(recipes, ["pub_date"], BATCH_SIZE)
+        ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+        recipe_tags = []
+        recipe_ingredients = []
+        recipe_ingredient_links = []
+        for recipe in recipes:
+            for tag in self.random.sample(tags, self.random.randint(1, 2)):
+                recipe_tags.append(
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                )
+            for ingredient_id in self.random.sample(
+                ingredient_ids, options["ingredients_per_recipe"]
+            ):
+                recipe_ingredients.append(
+                    RecipeIngredient(
+                        recipe_id=recipe.id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 500),
+                    )
+                )
+                recipe_ingredient_links.append(
+                    Recipe.ingredients.through(
+                        recipe_id=recipe.id, ingredient_id=ingredient_id
+                    )
+                )
+        Recipe.tags.through.objects.bulk_create(
+            recipe_tags, batch_size=BATCH_SIZE
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            recipe_ingredient_links, batch_size=BATCH_SIZE
+        )
+        RecipeIngredient.objects.bulk_create(
+            recipe_ingredients, batch_size=BATCH_SIZE
+        )
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).update_search_vector()
+        return recipes
+
+    def create_pairs(self, model, users, recipes, count, options):
+        # популярные рецепты чаще попадают в избранное и корзины
+        weights = zipf_weights(len(recipes), options["skew"])
+        pairs = set(model.objects.values_list("user_id", "recipe_id"))
+        objects = []
+        for user, recipe in zip(
+            self.random.choices(users, k=count),
+            self.random.choices(recipes, weights, k=count),
+        ):
+            if (user.id, recipe.id) in pairs:
+                continue
+            pairs.add((user.id, recipe.id))
+            objects.append(model(user_id=user.id, recipe_id=recipe.id))
+        model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+    def create_subscriptions(self, users, count, options):
+        # на плодовитых авторов подписываются чаще
+        weights = zipf_weights(len(users), options["skew"])
+        pairs = set(Subscriber.objects.values_list("user_id", "author_id"))
+        objects = []
+        for user, author in zip(
+            self.random.choices(users, k=count),
+            self.random.choices(users, weights, k=count),
+        ):
+            if user.id == author.id or (user.id, author.id) in pairs:
+                continue
+            pairs.add((user.id, author.id))
+            objects.append(Subscriber(user_id=user.id, author_id=author.id))
+        Subscriber.objects.bulk_create(objects, batch_size=BATCH_SIZE)
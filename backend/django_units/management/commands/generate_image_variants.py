@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from django_units.images import create_variants
+from django_units.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Создание уменьшенных копий изображений существующих рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать варианты, даже если они уже есть",
+        )
+
+    def handle(self, *args, **options):
+        created = 0
+        failed = 0
+        recipes = Recipe.objects.exclude(image="").only(
+            "id", "image", "image_variants", "modified"
+        )
+        for recipe in recipes.iterator():
+            old_variants = recipe.image_variants or {}
+            if (
+                not options["force"]
+                and old_variants.get("source") == recipe.image.name
+            ):
+                continue
+            try:
+                variants = create_variants(
+                    recipe.image, overwrite=options["force"]
+                )
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f"Рецепт {recipe.id}: {error}")
+                continue
+            # новое время изменения меняет ключ рецепта в кэше
+            recipe.image_variants = variants
+            recipe.save(update_fields=["image_variants", "modified"])
+            created += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"GENERATE IMAGE VARIANTS SUCCESS!!! "
+                f"created: {created}, failed: {failed}"
+            )
+        )
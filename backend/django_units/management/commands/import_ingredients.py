@@ -1,21 +1,36 @@
-from django.core.management.base import BaseCommand
+import os
 
-from django_units.models import Ingredient
+from django.core.management.base import BaseCommand, CommandError
+
+from django_units.ingredient_import import READERS, import_ingredients
 
 
 class Command(BaseCommand):
+    help = "Импорт ингредиентов из CSV или JSON каталога"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="data/ingredients.csv"
+        )
+        parser.add_argument(
+            "--format",
+            choices=list(READERS),
+            help="Формат файла, по умолчанию - по расширению",
+        )
+
     def handle(self, *args, **options):
-        with open('data/ingredients.csv', encoding='utf-8') as f:
-            n = 1
-            line = f.readline()
-            while line:
-                data = line.split(",")
-                Ingredient.objects.update_or_create(
-                    id=n,
-                    defaults={"name": data[0],
-                              "measurement_unit": data[1]
-                              },
-                    )
-                n += 1
-                line = f.readline()
-        print("IMPORT INGREDIENTS SUCCESS!!!")
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1][1:]
+        if file_format not in READERS:
+            raise CommandError(f"Неизвестный формат файла: {path}")
+        with open(path, encoding="utf-8", newline="") as f:
+            result = import_ingredients(READERS[file_format](f))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"IMPORT INGREDIENTS SUCCESS!!! "
+                f"inserted: {result.inserted}, "
+                f"updated: {result.updated}, "
+                f"unchanged: {result.unchanged}, "
+                f"time: {result.seconds:.2f}s"
+            )
+        )
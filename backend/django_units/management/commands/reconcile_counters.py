@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_units.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчет счетчиков избранного, корзин, рецептов и подписчиков "
+        "по фактическим данным"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            result = reconcile_counters(dry_run=options["dry_run"])
+        for counter, drifted in result.items():
+            if drifted:
+                self.stdout.write(
+                    f"drifted: {counter}: {drifted}", self.style.WARNING
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "RECONCILE COUNTERS SUCCESS!!! fixed rows: "
+                f"{0 if options['dry_run'] else sum(result.values())}"
+            )
+        )
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from django_units.models import (
+    FavoriteRecipe,
+    Recipe,
+    RecipeScore,
+    ShoppingCart,
+)
+
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Расчет оценок популярности рецептов для сортировки "
+        "ordering=popular и ordering=trending; запускается периодически"
+    )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        weights = settings.RECIPE_SCORE_WEIGHTS
+        trending = self.get_trending(started, weights)
+        # popular - по поддерживаемым счетчикам, без агрегации таблиц
+        scores = {
+            recipe_id: RecipeScore(
+                recipe_id=recipe_id,
+                popular=favorites * weights["favorites"]
+                + carts * weights["carts"],
+                trending=trending.get(recipe_id, 0.0),
+                computed=started,
+            )
+            for recipe_id, favorites, carts in Recipe.objects.values_list(
+                "id", "favorites_count", "in_carts_count"
+            ).iterator(chunk_size=BATCH_SIZE)
+        }
+        existing = set(
+            RecipeScore.objects.filter(
+                recipe_id__in=list(scores)
+            ).values_list("recipe_id", flat=True)
+        )
+        with transaction.atomic():
+            RecipeScore.objects.bulk_update(
+                [scores[recipe_id] for recipe_id in existing],
+                ["popular", "trending", "computed"],
+                batch_size=BATCH_SIZE,
+            )
+            # рецепты, удаленные во время расчета, пропускаются
+            missing = Recipe.objects.filter(
+                id__in=set(scores) - existing
+            ).values_list("id", flat=True)
+            RecipeScore.objects.bulk_create(
+                [scores[recipe_id] for recipe_id in missing],
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"UPDATE RECIPE SCORES SUCCESS!!! recipes: {len(scores)}, "
+                f"trending: {len(trending)}, time: "
+                f"{(timezone.now() - started).total_seconds():.2f}s"
+            )
+        )
+
+    def get_trending(self, now, weights):
+        # вклад каждого добавления убывает вдвое за период полураспада
+        half_life = settings.RECIPE_TRENDING_HALF_LIFE
+        since = now - timedelta(
+            seconds=half_life * settings.RECIPE_TRENDING_WINDOW
+        )
+        trending = defaultdict(float)
+        for model, weight in [
+            (FavoriteRecipe, weights["favorites"]),
+            (ShoppingCart, weights["carts"]),
+        ]:
+            for recipe_id, created in (
+                model.objects.filter(created__gte=since)
+                .values_list("recipe_id", "created")
+                .iterator(chunk_size=BATCH_SIZE)
+            ):
+                age = max((now - created).total_seconds(), 0)
+                trending[recipe_id] += weight * 0.5 ** (age / half_life)
+        return trending
@@ -0,0 +1,44 @@
+# Generated by Django 3.2 on 2026-10-18 17:48
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+# GIN-индекс и заполнение вектора есть только в PostgreSQL, в SQLite
+# поиск работает без индекса
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX recipe_search_vector_idx "
+        "ON django_units_recipe USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "UPDATE django_units_recipe SET search_vector = "
+        "setweight(to_tsvector(%s::regconfig, coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, coalesce(text, '')), 'B')",
+        [settings.RECIPE_SEARCH_CONFIG, settings.RECIPE_SEARCH_CONFIG],
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS recipe_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_units', '0011_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 17:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTERS = [
+    ("Recipe", "favorites_count", "FavoriteRecipe", "recipe"),
+    ("Recipe", "in_carts_count", "ShoppingCart", "recipe"),
+    ("CustomUser", "recipes_count", "Recipe", "author"),
+    ("CustomUser", "followers_count", "Subscriber", "author"),
+]
+
+
+def fill_counters(apps, schema_editor):
+    for model_name, field, counted_name, foreign_key in COUNTERS:
+        model = apps.get_model("django_units", model_name)
+        counted_model = apps.get_model("django_units", counted_name)
+        count = (
+            counted_model.objects.filter(**{foreign_key: OuterRef("pk")})
+            .order_by()
+            .values(foreign_key)
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        model.objects.update(**{field: Coalesce(Subquery(count), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_units', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# нулевые оценки для существующих рецептов, пока не отработала
+# команда update_recipe_scores
+def create_scores(apps, schema_editor):
+    Recipe = apps.get_model("django_units", "Recipe")
+    RecipeScore = apps.get_model("django_units", "RecipeScore")
+    RecipeScore.objects.bulk_create(
+        [
+            RecipeScore(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.values_list("id", flat=True)
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_units', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='django_units.recipe')),
+                ('popular', models.FloatField(default=0)),
+                ('trending', models.FloatField(default=0)),
+                ('computed', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='favoriterecipe',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', '-recipe'], name='recipe_score_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipe_score_trending'),
+        ),
+        migrations.RunPython(create_scores, migrations.RunPython.noop),
+    ]
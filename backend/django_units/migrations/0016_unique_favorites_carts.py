@@ -0,0 +1,82 @@
+# Generated by Django 3.2 on 2026-10-18 17:53
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTERS = [
+    ("FavoriteRecipe", "favorites_count"),
+    ("ShoppingCart", "in_carts_count"),
+]
+
+
+# повторы (user, recipe), накопившиеся без ограничения, удаляются до его
+# создания; удаление через исторические модели не отправляет сигналы,
+# поэтому счетчики затронутых рецептов пересчитываются здесь же
+def delete_duplicates(apps, schema_editor):
+    Recipe = apps.get_model("django_units", "Recipe")
+    for model_name, field in COUNTERS:
+        model = apps.get_model("django_units", model_name)
+        duplicates = (
+            model.objects.values("user", "recipe")
+            .annotate(first_id=Min("id"), total=Count("id"))
+            .filter(total__gt=1)
+        )
+        recipe_ids = set()
+        for duplicate in duplicates:
+            model.objects.filter(
+                user=duplicate["user"], recipe=duplicate["recipe"]
+            ).exclude(id=duplicate["first_id"]).delete()
+            recipe_ids.add(duplicate["recipe"])
+        if not recipe_ids:
+            continue
+        count = (
+            model.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            **{field: Coalesce(Subquery(count), 0)}
+        )
+
+
+# регистронезависимый поиск ингредиентов по началу названия
+# (name__istartswith) в PostgreSQL использует этот индекс
+def create_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX ingredient_name_upper_prefix "
+        'ON django_units_ingredient (UPPER("name"::text) text_pattern_ops)'
+    )
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS ingredient_name_upper_prefix")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_units', '0015_recipe_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favoriterecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='favorite_recipe_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='shopping_cart_user_recipe'),
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index
+        ),
+    ]
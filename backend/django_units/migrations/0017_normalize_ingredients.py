@@ -0,0 +1,65 @@
+import csv
+
+from django.conf import settings
+from django.db import migrations
+
+
+def read_legacy_catalog():
+    # прежняя команда импорта брала id по номеру строки каталога и
+    # делила строку по запятой: единица измерения сохранялась вместе с
+    # переводом строки, а названия в кавычках - разрезанными; для каждой
+    # строки возвращаются сохранённые тогда и правильные значения
+    path = settings.BASE_DIR / "data" / "ingredients.csv"
+    if not path.exists():
+        return {}
+    catalog = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        lines = f.read().splitlines(keepends=True)
+    for number, line in enumerate(lines, 1):
+        legacy = line.split(",")
+        row = next(csv.reader([line]), [])
+        if len(legacy) < 2 or len(row) < 2:
+            continue
+        catalog[number] = (
+            (legacy[0], legacy[1]),
+            (row[0].strip(), row[1].strip()),
+        )
+    return catalog
+
+
+def normalize_ingredients(apps, schema_editor):
+    # без исправления новый импорт не узнаёт эти строки и добавляет
+    # каталог заново, а рецепты ссылаются на старые id
+    Ingredient = apps.get_model("django_units", "Ingredient")
+    catalog = read_legacy_catalog()
+    changed = []
+    for ingredient in Ingredient.objects.only(
+        "id", "name", "measurement_unit"
+    ):
+        stored = (ingredient.name, ingredient.measurement_unit)
+        legacy, parsed = catalog.get(ingredient.id, (None, None))
+        if stored == legacy:
+            name, measurement_unit = parsed
+        else:
+            name = ingredient.name.strip()
+            measurement_unit = ingredient.measurement_unit.strip()
+        if (name, measurement_unit) != stored:
+            ingredient.name = name
+            ingredient.measurement_unit = measurement_unit
+            changed.append(ingredient)
+    Ingredient.objects.bulk_update(
+        changed, ["name", "measurement_unit"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_units', '0016_unique_favorites_carts'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            normalize_ingredients, migrations.RunPython.noop
+        ),
+    ]
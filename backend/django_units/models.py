@@ -1,5 +1,24 @@
-from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
+from django.db import connections, models
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from django_units.signals import data_changed
 
 
 class CustomUser(AbstractUser):
@@ -8,24 +27,195 @@ class CustomUser(AbstractUser):
     first_name = models.CharField(max_length=150, blank=False)
     last_name = models.CharField(max_length=150, blank=False)
     password = models.CharField(max_length=150, blank=False)
+    # счетчики поддерживаются receivers, расхождения исправляет
+    # команда reconcile_counters
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
 
 
+class RecipeQuerySet(models.QuerySet):
+    # пакетная подгрузка автора, тэгов и ингредиентов рецептов
+    def with_related(self):
+        return self.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "recipeingredient_set",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ),
+            ),
+        )
+
+    # подгрузка только того, что нужно полям из fields=; вложенные
+    # объекты без expand= выводятся по id и не требуют соединений
+    def with_fields(self, fields, expand):
+        queryset = self
+        if "author" in fields and "author" in expand:
+            queryset = queryset.select_related("author")
+        if "tags" in fields:
+            queryset = queryset.prefetch_related("tags")
+        if "ingredients" in fields:
+            recipe_ingredients = RecipeIngredient.objects.all()
+            if "ingredients" in expand:
+                recipe_ingredients = recipe_ingredients.select_related(
+                    "ingredient"
+                )
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "recipeingredient_set", queryset=recipe_ingredients
+                )
+            )
+        deferred = ["search_vector"]
+        if "text" not in fields:
+            deferred.append("text")
+        if "image_variants" not in fields:
+            deferred.append("image_variants")
+            if "image" not in fields:
+                deferred.append("image")
+        return queryset.defer(*deferred)
+
+    # признаки избранного, корзины и подписки на автора одним запросом
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                is_author_subscribed=Value(False),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef("pk")
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_author_subscribed=Exists(
+                Subscriber.objects.filter(
+                    user=user, author=OuterRef("author")
+                )
+            ),
+        )
+
+    def supports_full_text_search(self):
+        return connections[self.db].vendor == "postgresql"
+
+    # полнотекстовый поиск по названию и описанию, упорядоченный по
+    # релевантности; вне PostgreSQL - поиск подстроки, где совпадение
+    # в названии важнее совпадения в описании. LIKE в SQLite не
+    # учитывает регистр только для латиницы, поэтому там регистр
+    # приводится в Python
+    def search(self, text):
+        if not self.supports_full_text_search():
+            text = text.casefold()
+            name_ids = []
+            text_ids = []
+            for recipe_id, name, description in self.values_list(
+                "id", "name", "text"
+            ):
+                if text in name.casefold():
+                    name_ids.append(recipe_id)
+                elif text in description.casefold():
+                    text_ids.append(recipe_id)
+            return (
+                self.filter(id__in=name_ids + text_ids)
+                .annotate(
+                    rank=Case(
+                        When(id__in=name_ids, then=Value(1.0)),
+                        default=Value(0.5),
+                        output_field=models.FloatField(),
+                    )
+                )
+                .order_by("-rank", "-pub_date")
+            )
+        query = SearchQuery(
+            text, config=settings.RECIPE_SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            self.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-pub_date")
+        )
+
+    # порядок по рассчитанной оценке (popular или trending) из таблицы
+    # RecipeScore; внутреннее соединение позволяет читать ее по индексу
+    def order_by_score(self, score):
+        return (
+            self.filter(score__isnull=False)
+            .annotate(score_value=F(f"score__{score}"))
+            .order_by("-score_value", "-id")
+        )
+
+    # пересчет поискового вектора; вызывается при сохранении рецепта
+    def update_search_vector(self):
+        if not self.supports_full_text_search():
+            return 0
+        config = settings.RECIPE_SEARCH_CONFIG
+        return self.update(
+            search_vector=SearchVector("name", weight="A", config=config)
+            + SearchVector("text", weight="B", config=config)
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         "CustomUser", blank=False, on_delete=models.CASCADE
     )
     name = models.CharField(max_length=200, blank=False)
     image = models.ImageField(upload_to="recipes/images", blank=False)
+    image_variants = models.JSONField(default=dict, blank=True)
     text = models.CharField(max_length=2000, blank=False)
     ingredients = models.ManyToManyField("Ingredient", blank=False)
     tags = models.ManyToManyField("Tag", blank=False)
     cooking_time = models.IntegerField(blank=False)
     pub_date = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ["-pub_date"]
+        # общая лента и лента подписок читаются по индексу в порядке
+        # публикации, без сортировки всей таблицы
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="recipe_pub_date"),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_pub_date",
+            ),
+        ]
+
+
+class RecipeScore(models.Model):
+    # оценки популярности рассчитываются командой update_recipe_scores,
+    # новый рецепт получает нулевые оценки при создании
+    SCORES = ["popular", "trending"]
+
+    recipe = models.OneToOneField(
+        "Recipe",
+        primary_key=True,
+        related_name="score",
+        on_delete=models.CASCADE,
+    )
+    popular = models.FloatField(default=0)
+    trending = models.FloatField(default=0)
+    computed = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-popular", "-recipe"], name="recipe_score_popular"
+            ),
+            models.Index(
+                fields=["-trending", "-recipe"], name="recipe_score_trending"
+            ),
+        ]
 
 
 class Tag(models.Model):
@@ -48,6 +238,16 @@ class RecipeIngredient(models.Model):
 class FavoriteRecipe(models.Model):
     recipe = models.ForeignKey("Recipe", on_delete=models.CASCADE)
     user = models.ForeignKey("CustomUser", on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        # уникальный индекс (user, recipe) обслуживает и проверки
+        # наличия, и защищает от повторного добавления
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="favorite_recipe_user_recipe"
+            ),
+        ]
 
 
 class Subscriber(models.Model):
@@ -71,3 +271,43 @@ class Subscriber(models.Model):
 class ShoppingCart(models.Model):
     recipe = models.ForeignKey("Recipe", on_delete=models.CASCADE)
     user = models.ForeignKey("CustomUser", on_delete=models.CASCADE)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        # уникальный индекс (user, recipe) обслуживает и проверки
+        # наличия, и защищает от повторного добавления
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="shopping_cart_user_recipe"
+            ),
+        ]
+
+
+class DataVersion(models.Model):
+    # счетчик изменений набора данных (тэгов, ингредиентов, пользователей);
+    # дешево читается для ETag и Last-Modified
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def bump(cls, name):
+        now = timezone.now()
+        if not cls.objects.filter(name=name).update(
+            version=models.F("version") + 1, modified=now
+        ):
+            cls.objects.get_or_create(
+                name=name, defaults={"version": 1, "modified": now}
+            )
+        data_changed.send(sender=cls, name=name)
+
+    @classmethod
+    def get_many(cls, names):
+        versions = cls.objects.in_bulk(names)
+        return [
+            versions.get(name) or cls(name=name, modified=EPOCH)
+            for name in names
+        ]
+
+
+EPOCH = timezone.datetime(2023, 1, 1, tzinfo=timezone.utc)
@@ -0,0 +1,132 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django_units.counters import change_counters
+from django_units.images import (
+    content_name,
+    create_variants,
+    prepare_original,
+    touch,
+)
+from django_units.transactions import on_commit_once
+from django_units.models import (
+    CustomUser,
+    DataVersion,
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeScore,
+    ShoppingCart,
+    Subscriber,
+    Tag,
+)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(**kwargs):
+    DataVersion.bump("tags")
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(**kwargs):
+    DataVersion.bump("ingredients")
+
+
+@receiver(post_save, sender=CustomUser)
+def user_changed(update_fields=None, **kwargs):
+    # вход в админку меняет только last_login, это данные не меняет
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    DataVersion.bump("users")
+
+
+def touch_recipes(recipe_ids):
+    Recipe.objects.filter(id__in=recipe_ids).update(modified=timezone.now())
+
+
+# строки ингредиентов меняются пачками (правка рецепта, каскадное
+# удаление), поэтому время изменения рецепта обновляется один раз
+# после фиксации транзакции, а не на каждую строку
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    on_commit_once(touch_recipes, [instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Recipe):
+        recipe_ids = [instance.id]
+    else:
+        recipe_ids = pk_set or []
+    Recipe.objects.filter(id__in=recipe_ids).update(modified=timezone.now())
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_uploaded(instance, **kwargs):
+    if not instance.image or instance.image._committed:
+        return
+    prepare_original(instance.image)
+    name = content_name(instance.image)
+    stored_name = instance.image.field.generate_filename(instance, name)
+    if touch(stored_name, instance.image.storage):
+        # такое изображение уже сохранено - используем существующий файл
+        instance.image.name = stored_name
+        instance.image._committed = True
+    else:
+        instance.image.name = name
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, update_fields=None, **kwargs):
+    if update_fields is None or {"name", "text"} & set(update_fields):
+        Recipe.objects.filter(id=instance.id).update_search_vector()
+    # варианты изображения пересоздаются только при смене оригинала;
+    # старые файлы удаляет команда cleanup_images, так как на них могут
+    # ссылаться другие рецепты
+    if not instance.image:
+        return
+    old_variants = instance.image_variants or {}
+    if old_variants.get("source") == instance.image.name:
+        return
+    instance.image_variants = create_variants(instance.image)
+    # время изменения входит в ключ рецепта в кэше
+    Recipe.objects.filter(id=instance.id).update(
+        image_variants=instance.image_variants, modified=timezone.now()
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscriber)
+@receiver(post_save, sender=Recipe)
+def counted_object_created(sender, instance, created, **kwargs):
+    if created:
+        change_counters(sender, instance, 1)
+
+
+# удаление срабатывает и при каскаде (например, удалении рецепта)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscriber)
+@receiver(post_delete, sender=Recipe)
+def counted_object_deleted(sender, instance, **kwargs):
+    change_counters(sender, instance, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    # строка оценок нужна, чтобы рецепт попадал в сортировку по ним
+    if created:
+        RecipeScore.objects.create(recipe=instance)
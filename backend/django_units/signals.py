@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+
+# отправляется после увеличения версии DataVersion, аргумент name
+data_changed = Signal()
@@ -0,0 +1,41 @@
+import threading
+
+from django.db import transaction
+
+
+pending = threading.local()
+
+
+class PendingIds:
+    def __init__(self, callback):
+        self.callback = callback
+        self.ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        self.callback(self.ids)
+
+
+def on_commit_once(callback, ids, using=None):
+    # сигналы отдельных строк (например, строк ингредиентов рецепта)
+    # только собирают id, а callback вызывается один раз после фиксации
+    # транзакции со всеми собранными id; вне транзакции - сразу
+    connection = transaction.get_connection(using)
+    ids = {id for id in ids if id is not None}
+    if not connection.in_atomic_block:
+        if ids:
+            callback(ids)
+        return
+    batches = pending.__dict__.setdefault(connection.alias, {})
+    batch = batches.get(callback)
+    # после фиксации или отката точки сохранения, в которой был
+    # зарегистрирован обработчик, собирается новый пакет
+    if (
+        batch is None
+        or batch.done
+        or not any(item[1] is batch for item in connection.run_on_commit)
+    ):
+        batch = batches[callback] = PendingIds(callback)
+        transaction.on_commit(batch, using)
+    batch.ids.update(ids)
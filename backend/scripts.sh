@@ -6,4 +6,10 @@ python manage.py import_ingredients
 python manage.py collectstatic --clear
 cp -r /app/collected_static/. /backend_static/static/
 
-gunicorn --bind 0.0.0.0:8000 backend.wsgi
+# SERVER_MODE=async - ASGI с асинхронными представлениями чтения
+if [ "$SERVER_MODE" = "async" ]; then
+    gunicorn --bind 0.0.0.0:8000 \
+        --worker-class uvicorn.workers.UvicornWorker backend.asgi
+else
+    gunicorn --bind 0.0.0.0:8000 backend.wsgi
+fi